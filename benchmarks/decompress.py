@@ -0,0 +1,96 @@
+## -*- coding: UTF-8 -*-
+## decompress.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+'''
+Throughput benchmark of the portable XPRESS Huffman decoder (see: src.parsers.xpress)
+over a corpus of MAM-compressed prefetch files, reported next to the time taken to
+parse the decompressed files so the two can be compared.  Run from the repository root:
+
+    $ python benchmarks/decompress.py -s /path/to/compressed.pf [-s ...] [--number N]
+'''
+
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+sys.path.append(path.join(path.dirname(path.dirname(path.abspath(__file__))), 'lib'))
+
+from glob import glob
+from timeit import timeit
+from argparse import ArgumentParser
+
+from src.parsers.prefetch import Prefetch
+from src.parsers.xpress import decompress_mam
+
+def load_corpus(sources):
+    '''
+    Args:
+        sources: List<String>   => paths to compressed prefetch files and/or directories
+    Returns:
+        List<Tuple<String, Bytes>>
+        Name and contents of each MAM-compressed prefetch file in sources
+    Preconditions:
+        sources is of type List<String> (assumed True)
+    '''
+    corpus = list()
+    for source in sources:
+        for filepath in (sorted(glob(path.join(source, '*'))) if path.isdir(source) else [source]):
+            with open(filepath, 'rb') as pf:
+                data = pf.read()
+            if Prefetch._is_compressed(data):
+                corpus.append((path.basename(filepath), data))
+    return corpus
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmark throughput of the portable MAM decompressor')
+    parser.add_argument('-s', '--source', action='append', required=True, help='Path to compressed input file(s) or directories', dest='sources')
+    parser.add_argument('-n', '--number', type=int, default=10, help='Number of decompressions of each file to time', dest='number')
+    args = parser.parse_args()
+    corpus = load_corpus(args.sources)
+    assert len(corpus) > 0, 'No MAM-compressed prefetch files found in sources'
+    print('%-40s %10s %12s %12s %12s %12s'%('File', 'Packed', 'Unpacked', 'Decompress', 'Throughput', 'Parse'))
+    total_unpacked = 0
+    total_decompress = 0.0
+    total_parse = 0.0
+    for name, data in corpus:
+        decompressed = bytes(decompress_mam(data))
+        decompress_time = timeit(lambda: decompress_mam(data), number=args.number) / args.number
+        parse_time = timeit(lambda: Prefetch.from_bytes(decompressed).parse(), number=args.number) / args.number
+        total_unpacked += len(decompressed)
+        total_decompress += decompress_time
+        total_parse += parse_time
+        print('%-40s %8.1fKB %10.1fKB %10.2fms %8.1fMB/s %10.2fms'%(\
+            name[:40], 
+            len(data) / 1024, 
+            len(decompressed) / 1024, 
+            decompress_time * 1e3, 
+            len(decompressed) / decompress_time / 2**20, 
+            parse_time * 1e3\
+        ))
+    print('%-40s %10s %10.1fKB %10.2fms %8.1fMB/s %10.2fms'%(\
+        'Total (%d files)'%len(corpus), 
+        '', 
+        total_unpacked / 1024, 
+        total_decompress * 1e3, 
+        total_unpacked / total_decompress / 2**20, 
+        total_parse * 1e3\
+    ))
@@ -0,0 +1,95 @@
+## -*- coding: UTF-8 -*-
+## dispatch.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+'''
+Benchmark of the overhead of dispatching tasks to a pool of worker processes 
+(see: src.utils.parallel.WorkerPool) with and without batching, using tasks that
+do no work so that only pickling and queue synchronization are measured.  Run from 
+the repository root:
+
+    $ python benchmarks/dispatch.py [--tasks N] [--threads N] [-b BATCH_SIZE ...]
+'''
+
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+sys.path.append(path.join(path.dirname(path.dirname(path.abspath(__file__))), 'lib'))
+
+from time import perf_counter
+from argparse import ArgumentParser
+
+import src.utils.parallel as parallel
+
+class NullTask(object):
+    '''
+    Task that does no work, with a context like that of src.main.tasks.BaseParseFileOutputTask
+    '''
+    def __init__(self, source, nodeidx, **context):
+        self._source = source
+        self._nodeidx = nodeidx
+        self._context = context
+    def __call__(self, worker):
+        return [True]
+
+def time_dispatch(task_count, worker_count, batch_size):
+    '''
+    Args:
+        task_count: Integer     => number of tasks to dispatch
+        worker_count: Integer   => number of worker processes
+        batch_size: Integer     => number of tasks per queue item
+    Returns:
+        Float
+        Seconds taken to dispatch task_count tasks and wait for them to complete
+    Preconditions:
+        task_count is of type Integer > 0   (assumed True)
+        worker_count is of type Integer > 0 (assumed True)
+        batch_size is of type Integer > 0   (assumed True)
+    '''
+    pool = parallel.WorkerPool(\
+        parallel.JoinableQueue(-1), 
+        NullTask, 
+        daemonize=False, 
+        worker_count=worker_count,
+        task_kwargs=dict(target='/path/to/target', sep=',', sections=None, mmap=False, payload_cache=None),
+        batch_size=batch_size\
+    )
+    pool.start()
+    start = perf_counter()
+    for nodeidx in range(task_count):
+        pool.add_task('/path/to/prefetch/FILE-%08X.pf'%nodeidx, nodeidx)
+    pool.join_tasks()
+    elapsed = perf_counter() - start
+    pool.add_poison_pills()
+    pool.join_workers()
+    return elapsed
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmark overhead of dispatching tasks to worker processes')
+    parser.add_argument('--tasks', type=int, default=20000, help='Number of tasks to dispatch', dest='tasks')
+    parser.add_argument('--threads', type=int, default=4, help='Number of worker processes', dest='threads')
+    parser.add_argument('-b', '--batch-size', type=int, action='append', help='Batch size(s) to time (default: 1, 4, 16 and 64)', dest='batch_sizes')
+    args = parser.parse_args()
+    print('%-12s %12s %14s'%('Batch size', 'Elapsed', 'Throughput'))
+    for batch_size in (args.batch_sizes or [1, 4, 16, 64]):
+        elapsed = time_dispatch(args.tasks, args.threads, batch_size)
+        print('%-12d %10.2fs %8.0f tasks/s'%(batch_size, elapsed, args.tasks / elapsed))
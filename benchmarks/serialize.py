@@ -0,0 +1,144 @@
+## -*- coding: UTF-8 -*-
+## serialize.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+'''
+Allocation benchmark of Prefetch.serialize against the copy-then-prune
+pass it replaced, which converted every parsed entry to a Container,
+copied it and then deleted raw and private keys one at a time.  Run from
+the repository root:
+
+    $ python benchmarks/serialize.py -s /path/to/file.pf [-s ...] [--number N]
+'''
+
+import sys
+from os import path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+sys.path.append(path.join(path.dirname(path.dirname(path.abspath(__file__))), 'lib'))
+
+import tracemalloc
+from datetime import datetime
+from timeit import timeit
+from argparse import ArgumentParser
+from construct.lib import Container
+
+from src.parsers.prefetch import Prefetch
+from src.structures.records import BaseRecord
+
+def legacy_serialize(value):
+    '''
+    Args:
+        value: Any  => parsed value to serialize
+    Returns:
+        Any
+        Serialized value, produced the way Prefetch._clean_transform did
+        before it was removed (see: Prefetch._serialize_value)
+    Preconditions:
+        N/A
+    '''
+    if isinstance(value, BaseRecord):
+        value = value.to_container()
+    if issubclass(type(value), Container):
+        cleaned_value = Container(value)
+        for key in list(cleaned_value.keys()):
+            if key.startswith('Raw') or key.startswith('_'):
+                del cleaned_value[key]
+            else:
+                cleaned_value[key] = legacy_serialize(cleaned_value[key])
+        return cleaned_value
+    elif isinstance(value, list):
+        return list(map(legacy_serialize, value))
+    elif isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f%z')
+    return value
+
+def count_containers(serializer, prefetch_files):
+    '''
+    Args:
+        serializer: Callable<Prefetch> -> Container => serializer to measure
+        prefetch_files: List<Prefetch>              => parsed prefetch files to serialize
+    Returns:
+        Integer
+        Number of Container objects constructed while serializing prefetch_files
+    Preconditions:
+        serializer is of type Callable<Prefetch> -> Container   (assumed True)
+        prefetch_files is of type List<Prefetch>                (assumed True)
+    '''
+    count = [0]
+    original_init = Container.__init__
+    def counting_init(self, *args, **kwargs):
+        count[0] += 1
+        original_init(self, *args, **kwargs)
+    Container.__init__ = counting_init
+    try:
+        for pf in prefetch_files:
+            serializer(pf)
+    finally:
+        Container.__init__ = original_init
+    return count[0]
+
+def measure(serializer, prefetch_files):
+    '''
+    Args:
+        serializer: Callable<Prefetch> -> Container => serializer to measure
+        prefetch_files: List<Prefetch>              => parsed prefetch files to serialize
+    Returns:
+        Tuple<Integer, Integer>
+        Bytes retained by the serialized results, and the largest number of
+        bytes in use beyond the result while serializing any one file
+    Preconditions:
+        serializer is of type Callable<Prefetch> -> Container   (assumed True)
+        prefetch_files is of type List<Prefetch>                (assumed True)
+    '''
+    retained = 0
+    transient = 0
+    tracemalloc.start()
+    try:
+        for pf in prefetch_files:
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            result = serializer(pf)
+            current, peak = tracemalloc.get_traced_memory()
+            retained += current - start
+            transient = max(transient, peak - current)
+            del result
+    finally:
+        tracemalloc.stop()
+    return retained, transient
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmark allocations of Prefetch.serialize')
+    parser.add_argument('-s', '--source', action='append', required=True, help='Path to input file(s)', dest='sources')
+    parser.add_argument('-n', '--number', type=int, default=20, help='Number of serializations to time', dest='number')
+    args = parser.parse_args()
+    prefetch_files = [Prefetch(source).parse() for source in args.sources]
+    serializers = [\
+        ('legacy', lambda pf: legacy_serialize(Container((key, value) for key, value in pf.items() if not key.startswith('_')))),
+        ('single-pass', lambda pf: pf.serialize())\
+    ]
+    assert serializers[0][1](prefetch_files[0]) == serializers[1][1](prefetch_files[0]), 'Serializers do not agree'
+    print('%-12s %12s %14s %14s %14s'%('Serializer', 'Containers', 'Retained', 'Transient', 'Time'))
+    for name, serializer in serializers:
+        containers = count_containers(serializer, prefetch_files)
+        retained, transient = measure(serializer, prefetch_files)
+        elapsed = timeit(lambda: [serializer(pf) for pf in prefetch_files], number=args.number) / args.number
+        print('%-12s %12d %12.1fKB %12.1fKB %12.2fms'%(name, containers, retained / 1024, transient / 1024, elapsed * 1e3))
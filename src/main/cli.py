@@ -26,6 +26,7 @@ from os import path
 from argparse import ArgumentParser, ArgumentTypeError
 
 from src.main.directives import DirectiveRegistry
+from src.parsers.prefetch import Prefetch
 
 def DBConnectConfig(arg):
     '''
@@ -62,6 +63,22 @@ def FileFormatList(arg):
     except Exception as e:
         raise ArgumentTypeError(str(e))
 
+def SectionList(arg):
+    '''
+    Args:
+        arg: String => comma-separated prefetch section names
+    Returns:
+        List<String>
+        Prefetch sections to parse (see: src.parsers.prefetch.Prefetch.SECTIONS)
+    Preconditions:
+        arg is of type String   (assumed True)
+    '''
+    sections = [item.strip() for item in arg.strip().split(',') if len(item.strip()) > 0]
+    for section in sections:
+        if section not in Prefetch.SECTIONS:
+            raise ArgumentTypeError('invalid section %s (choices: %s)'%(section, ', '.join(Prefetch.SECTIONS)))
+    return sections
+
 def initialize_parser():
     '''
     Args:
@@ -86,6 +103,13 @@ def initialize_parser():
     base_parse_parent = ArgumentParser(add_help=False)
     base_parse_parent.add_argument('-s', '--source', action='append', help='Path to input file(s)', dest='sources')
     base_parse_parent.add_argument('--threads', type=int, default=1, help='Number of threads to use', dest='threads')
+    base_parse_parent.add_argument('--sections', type=SectionList, default=None, help='Comma-separated list of prefetch sections to parse, sections they depend on are parsed as well (default: all)', dest='sections')
+    base_parse_parent.add_argument('--mmap', action='store_true', help='Memory map input files instead of reading them into memory', dest='mmap')
+    base_parse_parent.add_argument('--archives', action='store_true', help='Parse prefetch files contained in zip and tar archives found among the sources', dest='archives')
+    base_parse_parent.add_argument('--payload-cache', type=str, default=None, help='Path to cache directory of decompressed Win10 prefetch payloads, reused across runs', dest='payload_cache')
+    base_parse_parent.add_argument('--payload-cache-size', type=int, default=1024, help='Maximum size of payload cache in MB, least recently used entries are evicted first (default: 1024)', dest='payload_cache_size')
+    base_parse_parent.add_argument('--batch-size', type=int, default=None, help='Number of files to send to a worker at a time (default: sized from number of files and threads)', dest='batch_size')
+    base_parse_parent.add_argument('--keep-order', action='store_true', help='Dispatch files in input order instead of largest (estimated) first', dest='keep_order')
 
     ## Base output parent
     base_output_parent = ArgumentParser(add_help=False)
@@ -118,7 +142,7 @@ def initialize_parser():
     csv_parse_directive.add_argument('info_type', \
         type=str, \
         default='summary', \
-        choices=['summary'], \
+        choices=['summary', 'file_metrics', 'trace_chains'], \
         help='Type of information to output')
     csv_parse_directive.set_defaults(func=DirectiveRegistry.retrieve('ParseCSVDirective'))
     
@@ -140,6 +164,8 @@ def initialize_parser():
 
     # Database parse directive
     db_parse_directive = parse_subdirectives.add_parser('db', parents=[base_parent, base_parse_parent, db_connect_parent], help='Parse prefetch file to database')
+    db_parse_directive.add_argument('--cache', type=str, default=None, help='Path to metadata cache, used to skip rehashing unchanged files across runs', dest='cache')
+    db_parse_directive.add_argument('--cache-size', type=int, default=1000000, help='Maximum number of entries to keep in metadata cache (default: 1000000)', dest='cache_size')
     db_parse_directive.set_defaults(func=DirectiveRegistry.retrieve('ParseDBDirective'))
 
     #TODO: implement conversion directives
@@ -161,4 +187,26 @@ def initialize_parser():
     query_directive.add_argument('-T', '--title', type=str, help='Title to use for output table', dest='title')
     query_directive.set_defaults(func=DirectiveRegistry.retrieve('DBQueryDirective'))
 
+    ## Decompress directive
+    decompress_directive = main_directives.add_parser('decompress', parents=[base_parent], help='Decompress Win10 prefetch files to plain (SCCA) prefetch files')
+    decompress_directive.add_argument('-s', '--source', action='append', required=True, help='Path to input file(s) or directories - can use multiple times', dest='sources')
+    decompress_directive.add_argument('-t', '--target', type=str, required=True, help='Path to output directory, relative paths of input files are preserved', dest='target')
+    decompress_directive.add_argument('--threads', type=int, default=1, help='Number of threads to use', dest='threads')
+    decompress_directive.add_argument('--archives', action='store_true', help='Decompress prefetch files contained in zip and tar archives found among the sources', dest='archives')
+    decompress_directive.add_argument('--all', action='store_true', help='Also copy prefetch files that are not compressed to output directory', dest='copy_all')
+    decompress_directive.add_argument('--payload-cache', type=str, default=None, help='Path to cache directory of decompressed Win10 prefetch payloads, reused across runs', dest='payload_cache')
+    decompress_directive.add_argument('--payload-cache-size', type=int, default=1024, help='Maximum size of payload cache in MB, least recently used entries are evicted first (default: 1024)', dest='payload_cache_size')
+    decompress_directive.set_defaults(func=DirectiveRegistry.retrieve('DecompressDirective'))
+
+    ## Cache directives
+    cache_directive = main_directives.add_parser('cache', help='Metadata cache directives')
+    cache_subdirectives = cache_directive.add_subparsers()
+
+    # Cache clear directive
+    cache_clear_directive = cache_subdirectives.add_parser('clear', parents=[base_parent], help='Invalidate metadata cache entries')
+    cache_clear_directive.add_argument('-c', '--cache', type=str, required=True, help='Path to metadata cache', dest='cache')
+    cache_clear_directive.add_argument('-s', '--source', action='append', help='Path to file(s) or directories to invalidate (default: all) - can use multiple times', dest='sources')
+    cache_clear_directive.add_argument('--max-age', type=int, default=None, help='Instead of invalidating, evict entries not used in this many days', dest='max_age')
+    cache_clear_directive.set_defaults(func=DirectiveRegistry.retrieve('CacheClearDirective'))
+
     return main_parser
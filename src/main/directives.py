@@ -24,9 +24,10 @@
 import logging
 Logger = logging.getLogger(__name__)
 import sys
-from os import path, stat, mkdir, rmdir
+from os import path, stat, fstat, mkdir, rmdir
 from time import sleep
-from glob import glob
+from glob import iglob
+from concurrent.futures import ThreadPoolExecutor
 from argparse import Namespace
 from construct.lib import Container
 from tqdm import tqdm
@@ -37,9 +38,13 @@ from src.utils.config import initialize_logger, synthesize_log_path
 from src.utils.registry import RegistryMetaclassMixin 
 from src.utils.logging import closeFileHandlers
 import src.utils.parallel as parallel
+import src.utils.archive as archive
 import src.main.tasks as tasks
+from src.parsers.prefetch import Prefetch
+from src.parsers.xpress import MAMHeader
 from src.database.manager import DBManager
 from src.database.models import BaseTable
+from src.utils.cache import MetadataCache, PayloadCache
 
 class DirectiveRegistry(RegistryMetaclassMixin, type):
     '''
@@ -131,18 +136,72 @@ class ParseDirectiveMixin(object):
     '''
     Mixin for directives that parse source files
     '''
+    _FRONTIER_THREADS = 16
+    ## Estimated cost of decompressing a MAM-compressed file relative to parsing it 
+    ## (see: benchmarks/decompress.py), used to split workers between the two stages
+    _DECOMPRESSION_WEIGHT = 3
+    ## Number of batches each parser worker should receive when sizing batches
+    ## automatically, so that batching does not undo load balancing between workers
+    _BATCHES_PER_WORKER = 8
+    _MAX_BATCH_SIZE = 64
+
     @staticmethod
-    def _get_frontier(sources):
+    def _expand_source(src, archives=False):
         '''
+        Args:
+            src: String         => path to source file
+            archives: Boolean   => whether to expand zip and tar archives into their prefetch members
+        Returns:
+            List<String|ArchiveMember>
+            Prefetch members of src if archives and src is an archive, [src] if src
+            has a prefetch signature (see: src.parsers.prefetch.Prefetch.has_signature),
+            and an empty list otherwise
+        Preconditions:
+            src is of type String           (assumed True)
+            archives is of type Boolean     (assumed True)
+        '''
+        if archives and archive.is_archive(src):
+            return archive.get_archive_members(src)
+        if Prefetch.has_signature(src):
+            return [src]
+        return list()
+    @classmethod
+    def _get_frontier(cls, sources, archives=False):
         '''
-        frontier = list()
-        for src in sources:
-            src = path.abspath(src)
-            if path.isfile(src):
-                frontier.append(src)
-            elif path.isdir(src):
-                for subsrc in glob(path.join(src, '*')):
-                    frontier.append(subsrc)
+        Args:
+            sources: List<String>   => paths to source files and/or directories
+            archives: Boolean       => whether to expand zip and tar archives into their prefetch members
+        Returns:
+            List<String|ArchiveMember>
+            Source files to parse, with directories expanded into the files they
+            contain and (if archives) archives expanded into their members.  Files
+            without a prefetch signature are left out, and the signature of each 
+            file is checked by a thread pool while the sources are still being traversed
+        Preconditions:
+            sources is of type List<String> (assumed True)
+            archives is of type Boolean     (assumed True)
+        '''
+        candidates = list()
+        with ThreadPoolExecutor(max_workers=cls._FRONTIER_THREADS) as executor:
+            for src in sources:
+                src = path.abspath(src)
+                if path.isfile(src):
+                    subsrcs = [src]
+                elif path.isdir(src):
+                    subsrcs = iglob(path.join(src, '*'))
+                else:
+                    continue
+                for subsrc in subsrcs:
+                    if path.isfile(subsrc):
+                        candidates.append((subsrc, executor.submit(cls._expand_source, subsrc, archives)))
+            frontier = list()
+            for subsrc, expanded in candidates:
+                try:
+                    frontier.extend(expanded.result())
+                except Exception as e:
+                    Logger.error('Failed to check source file %s (%s)'%(subsrc, str(e)))
+        if len(frontier) < len(candidates):
+            Logger.info('Skipping %d of %d source file(s) without a prefetch signature'%(len(candidates) - len(frontier), len(candidates)))
         return frontier
 
     @property
@@ -244,6 +303,229 @@ class ParseDirectiveMixin(object):
             N/A
         '''
         raise NotImplementedError('method _parse_postamble not implemented for %s'%type(self).__name__)
+    @classmethod
+    def _estimate_cost(cls, node):
+        '''
+        Args:
+            node: String|ArchiveMember  => Prefetch file to be parsed
+        Returns:
+            Tuple<Integer, Boolean>
+            Estimated cost of parsing node, i.e. its size in bytes, with MAM-compressed files 
+            counted at their decompressed size weighted by 1 + _DECOMPRESSION_WEIGHT, and whether 
+            node is MAM-compressed.  Archive members are not read, so are counted at their 
+            (compressed or not) size, and files too short to hold a MAM header at their size
+        Preconditions:
+            node is of type String or ArchiveMember (assumed True)
+        '''
+        if isinstance(node, archive.ArchiveMember):
+            return node.size or 0, False
+        try:
+            with open(node, 'rb') as pf:
+                signature = pf.read(MAMHeader.size)
+                size = fstat(pf.fileno()).st_size
+        except Exception as e:
+            Logger.warning('Failed to estimate cost of parsing %s (%s)'%(node, str(e)))
+            return 0, False
+        if len(signature) == MAMHeader.size and Prefetch._is_compressed(signature):
+            return MAMHeader.unpack(signature)[1] * (1 + cls._DECOMPRESSION_WEIGHT), True
+        return size, False
+    def _schedule_frontier(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            List<Tuple<Integer, String|ArchiveMember>>
+            Index and node of each file in frontier, in the order to dispatch them: tar archive 
+            members first, in archive order, so that each worker only reads forward through 
+            (compressed) tar archives (see: src.utils.archive.ArchiveMember.read), then the
+            remaining files largest estimated cost first (see: ParseDirectiveMixin._estimate_cost), 
+            so that a large file at the end of the frontier does not leave the other workers idle 
+            while it is parsed, or in input order if self.args.keep_order
+        Preconditions:
+            self._costs is of type List<Integer>    (assumed True)
+        '''
+        schedule = list(enumerate(self.frontier))
+        if not getattr(self.args, 'keep_order', False):
+            is_tar_member = lambda node: isinstance(node, archive.ArchiveMember) and node.archive_offset is not None
+            tar_schedule = sorted(\
+                (entry for entry in schedule if is_tar_member(entry[1])),
+                key=lambda entry: (entry[1].archive_path, entry[1].archive_offset)\
+            )
+            file_schedule = sorted(\
+                (entry for entry in schedule if not is_tar_member(entry[1])),
+                key=lambda entry: self._costs[entry[0]],
+                reverse=True\
+            )
+            schedule = tar_schedule + file_schedule
+        return schedule
+    def _dispatch_frontier(self, add_tasks):
+        '''
+        Args:
+            add_tasks: Callable<String|ArchiveMember, Integer>  => function that dispatches the task(s) 
+                                                                   parsing a node, given the node and its index
+        Procedure:
+            Dispatch the tasks of every node in frontier in scheduled order (see: ParseDirectiveMixin._schedule_frontier),
+            adding the batch of parser tasks (see: src.utils.parallel.WorkerPool.flush_tasks) as soon as its estimated 
+            cost reaches an even share of the frontier's total, so that the largest files are not batched together
+        Preconditions:
+            add_tasks is callable                   (assumed True)
+            self._costs is of type List<Integer>    (assumed True)
+        '''
+        batch_budget = sum(self._costs) / (self.pools.parser.worker_count * self._BATCHES_PER_WORKER)
+        batch_cost = 0
+        for nodeidx, node in self._schedule_frontier():
+            Logger.info('Parsing prefetch file %s (node %d)'%(node, nodeidx))
+            add_tasks(node, nodeidx)
+            batch_cost += self._costs[nodeidx]
+            if batch_cost >= batch_budget:
+                self.pools.parser.flush_tasks()
+                batch_cost = 0
+        self.pools.parser.flush_tasks()
+    def _split_workers(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Tuple<Integer, Integer>
+            Number of parser and decompressor workers to split self.args.threads between,
+            in proportion to the estimated work of each stage given the share of 
+            MAM-compressed files in the frontier (no decompressor workers if there are
+            no compressed files or only one thread, in which case parser workers decompress inline).
+            The estimated cost of each file (see: ParseDirectiveMixin._estimate_cost) is stored
+            in self._costs for scheduling, unless there is only one thread, in which case
+            scheduling cannot help and every file is given the same cost (keeping input order)
+        Preconditions:
+            self.frontier is of type List<String|ArchiveMember>   (assumed True)
+        '''
+        if self.args.threads < 2:
+            self._costs = [1] * len(self.frontier)
+            self._compressed_nodes = set()
+            return self.args.threads, 0
+        with ThreadPoolExecutor(max_workers=self._FRONTIER_THREADS) as executor:
+            estimates = list(executor.map(self._estimate_cost, self.frontier))
+        self._costs = [cost for cost, _ in estimates]
+        self._compressed_nodes = set(\
+            node for node, (_, compressed) in zip(self.frontier, estimates) if compressed\
+        )
+        if len(self._compressed_nodes) == 0:
+            return self.args.threads, 0
+        decompression_work = len(self._compressed_nodes) * self._DECOMPRESSION_WEIGHT
+        decompressor_count = int(round(self.args.threads * decompression_work / (decompression_work + len(self.frontier))))
+        decompressor_count = min(max(decompressor_count, 1), self.args.threads - 1)
+        Logger.info('Splitting %d workers into %d parser and %d decompressor workers (%d of %d files compressed)'%(\
+            self.args.threads, 
+            self.args.threads - decompressor_count, 
+            decompressor_count, 
+            len(self._compressed_nodes), 
+            len(self.frontier)\
+        ))
+        return self.args.threads - decompressor_count, decompressor_count
+    def _get_batch_size(self, worker_count):
+        '''
+        Args:
+            worker_count: Integer   => number of parser workers
+        Returns:
+            Integer
+            Number of tasks to put on the parser queue as a single item (see: src.utils.parallel.TaskBatch),
+            either self.args.batch_size or, if not supplied, sized from the frontier so that each
+            worker receives about _BATCHES_PER_WORKER batches (at most _MAX_BATCH_SIZE tasks each)
+        Preconditions:
+            worker_count is of type Integer > 0 (assumed True)
+        '''
+        if getattr(self.args, 'batch_size', None) is not None:
+            return max(self.args.batch_size, 1)
+        batch_size = len(self.frontier) // (worker_count * self._BATCHES_PER_WORKER)
+        return min(max(batch_size, 1), self._MAX_BATCH_SIZE)
+    def _prepare_decompressor_pool(self, worker_count):
+        '''
+        Args:
+            worker_count: Integer   => number of decompressor workers
+        Procedure:
+            Create pool of decompressor workers in front of the parser pool, which pass the 
+            parse tasks of each MAM-compressed file on to the parser pool once it is decompressed
+        Preconditions:
+            worker_count is of type Integer >= 0    (assumed True)
+            self.pools.parser is of type WorkerPool (assumed True)
+        '''
+        if worker_count == 0:
+            self.pools.decompressor = None
+            return
+        self.pools.decompressor = parallel.WorkerPool(\
+            parallel.JoinableQueue(-1), 
+            tasks.DecompressTask, 
+            daemonize=False, 
+            worker_count=worker_count,
+            worker_kwargs=dict(\
+                result_queue=self.pools.parser.queue, 
+                log_path=self.args.log_path\
+            ),
+            task_kwargs=dict(mmap=self.args.mmap, payload_cache=self.args.payload_cache)\
+        )
+    def _dispatch_tasks(self, node, parse_tasks):
+        '''
+        Args:
+            node: String|ArchiveMember  => Prefetch file being parsed
+            parse_tasks: List<Any>      => tasks that parse node
+        Procedure:
+            Add parse_tasks to the decompressor pool if node is MAM-compressed (and there 
+            is a decompressor pool), or directly to the parser pool otherwise
+        Preconditions:
+            parse_tasks is of type List<Any>    (assumed True)
+        '''
+        if self.pools.get('decompressor') is not None and node in self._compressed_nodes:
+            self.pools.decompressor.add_task(node, parse_tasks)
+        else:
+            for parse_task in parse_tasks:
+                self.pools.parser.add_task(parse_task, included=True)
+    def _dispatch_task(self, node, *args):
+        '''
+        Args:
+            node: String|ArchiveMember  => Prefetch file being parsed
+            args: Tuple<Any>            => arguments to create task of parser pool with
+        Procedure:
+            Dispatch task of parser pool created from args (see: ParseDirectiveMixin._dispatch_tasks),
+            leaving it to the parser pool to create the task if node is not decompressed separately, 
+            so that only args (i.e. the path of node) are pickled when tasks are batched
+            (see: src.utils.parallel.TaskBatch)
+        Preconditions:
+            N/A
+        '''
+        if self.pools.get('decompressor') is not None and node in self._compressed_nodes:
+            self.pools.decompressor.add_task(node, [self.pools.parser.create_task(*args)])
+        else:
+            self.pools.parser.add_task(*args)
+    def _join_decompressor_pool(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Wait for decompressor pool (if any) to hand all of its parse tasks 
+            to the parser pool, then stop its workers
+        Preconditions:
+            N/A
+        '''
+        if self.pools.get('decompressor') is not None:
+            self.pools.decompressor.join_tasks()
+            self.pools.decompressor.add_poison_pills()
+            self.pools.decompressor.join_workers()
+    def _evict_payload_cache(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Evict least recently used entries from the payload cache (if any)
+            until it is no larger than self.args.payload_cache_size MB
+        Preconditions:
+            N/A
+        '''
+        if getattr(self.args, 'payload_cache', None) is None:
+            return
+        try:
+            removed = PayloadCache(self.args.payload_cache).evict(self.args.payload_cache_size * 1024 * 1024)
+        except Exception as e:
+            Logger.error('Failed to evict entries from payload cache %s (%s)'%(self.args.payload_cache, str(e)))
+        else:
+            Logger.info('Evicted %d entries from payload cache %s'%(removed, self.args.payload_cache))
     def run(self):
         '''
         Args:
@@ -260,6 +542,7 @@ class ParseDirectiveMixin(object):
             self._parse_preamble()
             self._parse_loop()
             self._parse_postamble()
+        self._evict_payload_cache()
 
 class DBConnectionMixin(object):
     '''
@@ -314,7 +597,7 @@ class BaseParseFileOutputDirective(ParseDirectiveMixin, BaseDirective):
         '''
         @ParseDirectiveMixin._prepare_frontier
         '''
-        self.frontier = self._get_frontier(self.args.sources)
+        self.frontier = self._get_frontier(self.args.sources, self.args.archives)
     def _should_parse(self):
         '''
         @ParseDirectiveMixin._should_parse
@@ -360,14 +643,18 @@ class BaseParseFileOutputDirective(ParseDirectiveMixin, BaseDirective):
                 punit='files'\
             )\
         )
+        parser_count, decompressor_count = self._split_workers()
         self.pools.parser = parallel.WorkerPool(\
             parallel.JoinableQueue(-1), 
             self._TASK_CLASS, 
             daemonize=False, 
-            worker_count=self.args.threads,
+            worker_count=parser_count,
             worker_kwargs=self._get_worker_kwargs(),
-            task_kwargs=self._get_task_kwargs()\
+            task_kwargs=self._get_task_kwargs(),
+            batch_size=self._get_batch_size(parser_count)\
         )
+        Logger.info('Dispatching parse tasks in batches of %d'%self.pools.parser.batch_size)
+        self._prepare_decompressor_pool(decompressor_count)
     def _parse_preamble(self):
         '''
         @ParseDirectiveMixin._parse_preamble
@@ -384,16 +671,17 @@ class BaseParseFileOutputDirective(ParseDirectiveMixin, BaseDirective):
             node is of type String      (assumed True)
             nodeidx is of type Integer  (assumed True)
         '''
-        self.pools.parser.add_task(node, nodeidx)
+        self._dispatch_task(node, node, nodeidx)
     def _parse_loop(self):
         '''
         @ParseDirectiveMixin._parse_loop
         '''
         self.pools.progress.start()
         self.pools.parser.start()
-        for nodeidx, node in enumerate(self.frontier):
-            Logger.info('Parsing prefetch file %s (node %d)'%(node, nodeidx))
-            self._add_tasks(node, nodeidx)
+        if self.pools.decompressor is not None:
+            self.pools.decompressor.start()
+        self._dispatch_frontier(self._add_tasks)
+        self._join_decompressor_pool()
         self.pools.parser.join_tasks()
         self.pools.progress.join_tasks()
         self.pools.progress.add_poison_pills()
@@ -404,7 +692,7 @@ class BaseParseFileOutputDirective(ParseDirectiveMixin, BaseDirective):
         '''
         @ParseDirectiveMixin._parse_postamble
         '''
-        parallel.coalesce_files(path.join(self.args.target_parent, '*_tmp_apf.out'), self.args.target)
+        parallel.coalesce_indexed_files(path.join(self.args.target_parent, '*_tmp_apf.out'), self.args.target)
 
 class ParseCSVDirective(BaseParseFileOutputDirective):
     '''
@@ -416,7 +704,7 @@ class ParseCSVDirective(BaseParseFileOutputDirective):
         '''
         @BaseParseFileOutputDirective._get_task_kwargs
         '''
-        return dict(info_type=self.args.info_type, target=self.args.target_parent, sep=self.args.sep)
+        return dict(info_type=self.args.info_type, target=self.args.target_parent, sep=self.args.sep, sections=self.args.sections, mmap=self.args.mmap, payload_cache=self.args.payload_cache)
     def _get_worker_kwargs(self):
         '''
         @BaseParseFileOutputDirective._get_worker_kwargs
@@ -430,12 +718,25 @@ class ParseCSVDirective(BaseParseFileOutputDirective):
             args.sources: List<String>  => list of Prefetch file(s) to parse
             args.target: String         => path to output file
             args.sep: String            => separator to use in output file
+            args.sections: List<String> => prefetch sections to parse (None for all)
+            args.mmap: Boolean          => whether to memory map input files
+            args.archives: Boolean      => whether to parse prefetch files in zip and tar archives
+            args.payload_cache: String  => path to cache directory of decompressed payloads
+            args.payload_cache_size: Integer => maximum size of payload cache in MB
+            args.batch_size: Integer    => number of files per parser queue item (None to size automatically)
+            args.keep_order: Boolean    => whether to dispatch files in input order instead of largest first
         Procedure:
             Parse Prefetch information to CSV format
-            FIELDS: Version Signature ExecutableName PrefetchHash
-                    SectionAEntriesCount SectionBEntriesCount SectionCLength SectionDEntriesCount
-                    LastExecutionTime ExecutionCount VolumeDevicePath VolumeCreateTime VolumeSerialNumber
-                    FileMetricsCount TraceChainsAccount FileReferenceCount DirectoryStringsCount FileNameStrings
+            FIELDS (summary):   Version Signature ExecutableName PrefetchHash
+                                SectionAEntriesCount SectionBEntriesCount SectionCLength SectionDEntriesCount
+                                LastExecutionTime ExecutionCount VolumeDevicePath VolumeCreateTime VolumeSerialNumber
+                                FileMetricsCount TraceChainsAccount FileReferenceCount DirectoryStringsCount FileNameStrings
+            FIELDS (file_metrics):  ExecutableName PrefetchHash EntryIndex StartTime Duration AverageDuration 
+                                    FileNameOffset FileNameLength FileReferenceSegmentNumber FileReferenceSequenceNumber
+                                    FileNameString
+            FIELDS (trace_chains):  ExecutableName PrefetchHash EntryIndex NextEntryIndex TotalBlockLoadCount SampleDuration
+            The file_metrics and trace_chains information types write one row per entry of that section,
+            and always parse the sections they need (regardless of args.sections)
         Preconditions:
             @BaseDirective.run_directive
             args.info_type is of type String        (assumed True)
@@ -456,7 +757,7 @@ class ParseBODYDirective(BaseParseFileOutputDirective):
         '''
         @BaseParseFileOutputDirective._get_task_kwargs
         '''
-        return dict(target=self.args.target_parent, sep=self.args.sep)
+        return dict(target=self.args.target_parent, sep=self.args.sep, sections=self.args.sections, mmap=self.args.mmap, payload_cache=self.args.payload_cache)
     def _get_worker_kwargs(self):
         '''
         @BaseParseFileOutputDirective._get_worker_kwargs
@@ -469,6 +770,13 @@ class ParseBODYDirective(BaseParseFileOutputDirective):
             args.sources: List<String>  => list of Prefetch file(s) to parse
             args.target: String         => path to output file
             args.sep: String            => separator to use in output file
+            args.sections: List<String> => prefetch sections to parse (None for all)
+            args.mmap: Boolean          => whether to memory map input files
+            args.archives: Boolean      => whether to parse prefetch files in zip and tar archives
+            args.payload_cache: String  => path to cache directory of decompressed payloads
+            args.payload_cache_size: Integer => maximum size of payload cache in MB
+            args.batch_size: Integer    => number of files per parser queue item (None to size automatically)
+            args.keep_order: Boolean    => whether to dispatch files in input order instead of largest first
         Procedure:
             Parse Prefetch information to BODY format
             FIELDS: nodeidx|recordidx|MD5|name|inode|mode_as_string|UID|GID|size|atime|mtime|ctime|crtime
@@ -491,7 +799,7 @@ class ParseJSONDirective(BaseParseFileOutputDirective):
         '''
         @BaseParseFileOutputDirective._get_task_kwargs
         '''
-        return dict(target=self.args.target_parent, pretty=self.args.pretty if self.args.threads == 1 else False)
+        return dict(target=self.args.target_parent, pretty=self.args.pretty if self.args.threads == 1 else False, sections=self.args.sections, mmap=self.args.mmap, payload_cache=self.args.payload_cache)
     def _get_worker_kwargs(self):
         '''
         @BaseParseFileOutputDirective._get_worker_kwargs
@@ -504,6 +812,13 @@ class ParseJSONDirective(BaseParseFileOutputDirective):
             args.sources: List<String>  => list of Prefetch file(s) to parse
             args.target: String         => path to output file
             args.pretty                 => whether to pretty print JSON output
+            args.sections: List<String> => prefetch sections to parse (None for all)
+            args.mmap: Boolean          => whether to memory map input files
+            args.archives: Boolean      => whether to parse prefetch files in zip and tar archives
+            args.payload_cache: String  => path to cache directory of decompressed payloads
+            args.payload_cache_size: Integer => maximum size of payload cache in MB
+            args.batch_size: Integer    => number of files per parser queue item (None to size automatically)
+            args.keep_order: Boolean    => whether to dispatch files in input order instead of largest first
         Procedure:
             Parse Prefetch information to JSON format
         Preconditions:
@@ -550,28 +865,23 @@ class ParseFILEDirective(BaseParseFileOutputDirective):
         '''
         @BaseParseFileOutputDirective._add_tasks
         '''
+        parse_tasks = list()
         for fmt in self.args.formats:
-            kwargs = dict(target=path.join(self.args.target_parent, fmt))
+            kwargs = dict(target=path.join(self.args.target_parent, fmt), sections=self.args.sections, mmap=self.args.mmap, payload_cache=self.args.payload_cache)
             if fmt != 'json':
                 kwargs['sep'] = self.args.sep if fmt != 'body' else '|'
                 if fmt == 'csv':
                     kwargs['info_type'] = self.args.info_type
             else:
                 kwargs['pretty'] = self.args.pretty if self.args.threads == 1 else False
-            self.pools.parser.add_task(\
-                getattr(tasks, 'Parse' + fmt.upper() + 'Task')(\
-                    node,
-                    nodeidx,
-                    **kwargs\
-                ),
-                included=True\
-            )
+            parse_tasks.append(getattr(tasks, 'Parse' + fmt.upper() + 'Task')(node, nodeidx, **kwargs))
+        self._dispatch_tasks(node, parse_tasks)
     def _parse_postamble(self):
         '''
         @ParseDirectiveMixin._parse_postamble
         '''
         for fmt in self.args.formats:
-            parallel.coalesce_files(\
+            parallel.coalesce_indexed_files(\
                 path.join(self.args.target_parent, fmt, '*_tmp_apf.out'),
                 self.args.target + '.' + fmt\
             )
@@ -629,7 +939,7 @@ class ParseDBDirective(ParseDirectiveMixin, BaseDirective, DBConnectionMixin):
         '''
         @ParseDirectiveMixin._prepare_frontier
         '''
-        self.frontier = self._get_frontier(self.args.sources)
+        self.frontier = self._get_frontier(self.args.sources, self.args.archives)
     def _should_parse(self):
         '''
         @ParseDirectiveMixin._should_parse
@@ -655,16 +965,21 @@ class ParseDBDirective(ParseDirectiveMixin, BaseDirective, DBConnectionMixin):
                 manager=DBManager(conn_string=self.conn_string)\
             )\
         )
+        parser_count, decompressor_count = self._split_workers()
         self.pools.parser = parallel.WorkerPool(\
             parallel.JoinableQueue(-1), 
             tasks.ParseDBTaskStage1, 
             daemonize=False, 
-            worker_count=self.args.threads,
+            worker_count=parser_count,
             worker_kwargs=dict(\
                 result_queue=self.pools.progress.queue, 
                 log_path=self.args.log_path\
-            )
+            ),
+            task_kwargs=dict(sections=self.args.sections, mmap=self.args.mmap, cache=self.args.cache, payload_cache=self.args.payload_cache),
+            batch_size=self._get_batch_size(parser_count)\
         )
+        Logger.info('Dispatching parse tasks in batches of %d'%self.pools.parser.batch_size)
+        self._prepare_decompressor_pool(decompressor_count)
     def _parse_preamble(self):
         '''
         @ParseDirectiveMixin._parse_preamble
@@ -676,9 +991,10 @@ class ParseDBDirective(ParseDirectiveMixin, BaseDirective, DBConnectionMixin):
         '''
         self.pools.progress.start()
         self.pools.parser.start()
-        for nodeidx, node in enumerate(self.frontier):
-            Logger.info('Parsing prefetch file %s (node %d)'%(node, nodeidx))
-            self.pools.parser.add_task(node)
+        if self.pools.decompressor is not None:
+            self.pools.decompressor.start()
+        self._dispatch_frontier(lambda node, nodeidx: self._dispatch_task(node, node))
+        self._join_decompressor_pool()
         self.pools.parser.join_tasks()
         self.pools.progress.join_tasks()
         self.pools.progress.add_poison_pills()
@@ -689,7 +1005,15 @@ class ParseDBDirective(ParseDirectiveMixin, BaseDirective, DBConnectionMixin):
         '''
         @ParseDirectiveMixin._parse_postamble
         '''
-        pass
+        if self.args.cache is not None:
+            try:
+                cache = MetadataCache(self.args.cache)
+                removed = cache.evict(max_entries=self.args.cache_size)
+                cache.close()
+            except Exception as e:
+                Logger.error('Failed to evict entries from metadata cache %s (%s)'%(self.args.cache, str(e)))
+            else:
+                Logger.info('Evicted %d entries from metadata cache %s'%(removed, self.args.cache))
     def run(self):
         '''
         Args:
@@ -707,6 +1031,10 @@ class ParseDBDirective(ParseDirectiveMixin, BaseDirective, DBConnectionMixin):
                 1) self.args.db_driver is sqlite and self.args.db_name is a valid path
                 2) self.args.db_conn_string is not None and is valid connection string 
                 3) self.args.db_user, self.args.db_passwd, self.args.db_host, and self.args.db_port are not None
+            self.args.cache is of type String           (optional)
+            self.args.cache_size is of type Integer     (optional)
+            self.args.batch_size is of type Integer     (optional)
+            self.args.keep_order is of type Boolean     (optional)
         '''
         super(ParseDBDirective, self).run()
 
@@ -772,3 +1100,182 @@ class DBQueryDirective(BaseDirective, DBConnectionMixin):
                             print(self.args.sep.join([str(item) for item in result]))
             else:
                 Logger.info('No results found for query %s'%self.args.query)
+
+class CacheClearDirective(BaseDirective):
+    '''
+    Directive for invalidating entries of a metadata cache
+    '''
+    def run(self):
+        '''
+        Args:
+            @BaseDirective.run_directive
+            args.cache: String          => path to metadata cache (see: src.utils.cache.MetadataCache)
+            args.sources: List<String>  => paths of files (or directories) to invalidate (default: all)
+            args.max_age: Integer       => number of days since last use after which to evict entries
+        Procedure:
+            Remove entries for args.sources (or every entry) from metadata cache, 
+            or evict entries not used in the last args.max_age days
+        Preconditions:
+            @BaseDirective.run_directive
+            args.cache is of type String
+            args.sources is of type List<String>    (optional)
+            args.max_age is of type Integer         (optional)
+        '''
+        assert isinstance(self.args.cache, str), 'Cache is not of type String'
+        assert path.isfile(self.args.cache), 'Cache does not point to existing file'
+        cache = MetadataCache(self.args.cache)
+        try:
+            if self.args.max_age is not None:
+                removed = cache.evict(max_age=self.args.max_age)
+            else:
+                removed = cache.invalidate(self.args.sources)
+        except Exception as e:
+            Logger.error('Failed to invalidate entries of metadata cache %s (%s)'%(self.args.cache, str(e)))
+        else:
+            Logger.info('Removed %d entries from metadata cache %s'%(removed, self.args.cache))
+            print('Removed %d entries from metadata cache %s'%(removed, self.args.cache))
+        finally:
+            cache.close()
+
+class DecompressDirective(ParseDirectiveMixin, BaseDirective):
+    '''
+    Directive for decompressing Win10 prefetch files to plain (SCCA) prefetch files
+    '''
+    def __init__(self, args):
+        self._frontier = None
+        self._pools = None
+        self._targets = None
+        super(DecompressDirective, self).__init__(args)
+    @staticmethod
+    def _get_relative_path(node, root):
+        '''
+        Args:
+            node: String|ArchiveMember  => prefetch file in frontier
+            root: String                => absolute path of source (file or directory) node was found in
+        Returns:
+            String
+            Path of node relative to root if root is a directory, or its filename otherwise,
+            with archive members placed below a directory named after their archive.
+            None if the path would lie outside of the target directory (i.e. a member name containing ..)
+        Preconditions:
+            node is of type String or ArchiveMember (assumed True)
+            root is of type String                  (assumed True)
+        '''
+        filepath = node.archive_path if isinstance(node, archive.ArchiveMember) else node
+        relative_path = path.relpath(filepath, root) if path.isdir(root) else path.basename(filepath)
+        if isinstance(node, archive.ArchiveMember):
+            relative_path = path.join(relative_path, *node.member_name.split('/'))
+        relative_path = path.normpath(relative_path)
+        if path.isabs(relative_path) or relative_path.split(path.sep)[0] == '..':
+            return None
+        return relative_path
+    def _prepare_args(self):
+        '''
+        @ParseDirectiveMixin._prepare_args
+        '''
+        assert path.isdir(self.args.target), 'Target does not point to existing directory'
+        self.args.target = path.abspath(self.args.target)
+    def _prepare_frontier(self):
+        '''
+        @ParseDirectiveMixin._prepare_frontier
+        '''
+        self.frontier = list()
+        self._targets = list()
+        seen = set()
+        for src in self.args.sources:
+            root = path.abspath(src)
+            for node in self._get_frontier([src], self.args.archives):
+                relative_path = self._get_relative_path(node, root)
+                if relative_path is None:
+                    Logger.warning('Skipping %s, as it would be written outside of target directory'%node)
+                    continue
+                target = path.join(self.args.target, relative_path)
+                if target == node:
+                    Logger.warning('Skipping %s, as it would be overwritten'%node)
+                    continue
+                if target in seen:
+                    Logger.warning('Skipping %s, as another source file is written to %s'%(node, target))
+                    continue
+                seen.add(target)
+                self.frontier.append(node)
+                self._targets.append(target)
+    def _should_parse(self):
+        '''
+        @ParseDirectiveMixin._should_parse
+        '''
+        return len(self.frontier) > 0
+    def _prepare_worker_pools(self):
+        '''
+        @ParseDirectiveMixin._prepare_worker_pools
+        '''
+        if self.pools is None:
+            self.pools = Container()
+        self.pools.progress = parallel.WorkerPool(\
+            parallel.JoinableQueue(-1), 
+            None,
+            daemonize=False,
+            worker_class=parallel.ProgressTrackerWorker,
+            worker_count=1,
+            worker_kwargs=dict(\
+                pcount=len(self.frontier),
+                pdesc='Total',
+                punit='files'\
+            )\
+        )
+        self.pools.decompressor = parallel.WorkerPool(\
+            parallel.JoinableQueue(-1), 
+            tasks.DecompressFileTask, 
+            daemonize=False, 
+            worker_count=self.args.threads,
+            worker_kwargs=dict(\
+                result_queue=self.pools.progress.queue, 
+                log_path=self.args.log_path\
+            ),
+            task_kwargs=dict(copy_all=self.args.copy_all, payload_cache=self.args.payload_cache)\
+        )
+    def _parse_preamble(self):
+        '''
+        @ParseDirectiveMixin._parse_preamble
+        '''
+        tqdm.set_lock(parallel.RLock())
+    def _parse_loop(self):
+        '''
+        @ParseDirectiveMixin._parse_loop
+        '''
+        self.pools.progress.start()
+        self.pools.decompressor.start()
+        for nodeidx, (node, target) in enumerate(zip(self.frontier, self._targets)):
+            Logger.info('Decompressing prefetch file %s to %s (node %d)'%(node, target, nodeidx))
+            self.pools.decompressor.add_task(node, target)
+        self.pools.decompressor.join_tasks()
+        self.pools.progress.join_tasks()
+        self.pools.progress.add_poison_pills()
+        self.pools.progress.join_workers()
+        self.pools.decompressor.add_poison_pills()
+        self.pools.decompressor.join_workers()
+    def _parse_postamble(self):
+        '''
+        @ParseDirectiveMixin._parse_postamble
+        '''
+        return None
+    def run(self):
+        '''
+        Args:
+            @BaseDirective.run_directive
+            args.sources: List<String>  => list of Prefetch file(s) (or directories) to decompress
+            args.target: String         => path to output directory
+            args.archives: Boolean      => whether to decompress prefetch files in zip and tar archives
+            args.copy_all: Boolean      => whether to also copy prefetch files that are not compressed
+            args.payload_cache: String  => path to cache directory of decompressed payloads
+            args.payload_cache_size: Integer => maximum size of payload cache in MB
+        Procedure:
+            Write each MAM-compressed prefetch file found in args.sources to args.target
+            as a plain (SCCA) prefetch file, at the same path relative to the source 
+            (directory) it was found in (see: DecompressDirective._get_relative_path)
+        Preconditions:
+            @BaseDirective.run_directive
+            args.sources is of type List<String>    (assumed True)
+            args.target is of type String           (assumed True)
+            args.target points to existing directory
+        '''
+        super(DecompressDirective, self).run()
@@ -23,12 +23,17 @@
 
 import logging
 Logger = logging.getLogger(__name__)
-from os import path, stat
+from os import path, stat, makedirs, replace, remove, getpid
 from datetime import datetime, timezone, timedelta
 from json import dumps
 from construct.lib import Container
 
 from src.parsers.prefetch import Prefetch
+import src.structures.columnar as pfcolumnar
+from src.utils.archive import ArchiveMember
+from src.utils.cache import get_metadata_cache, PayloadCache
+from src.utils.parallel import get_index_path
+from src.utils.time import epoch_us_to_datetime
 import src.database.models as db
 
 class BaseParseTask(object):
@@ -39,6 +44,30 @@ class BaseParseTask(object):
     def __init__(self, source):
         self._source = source
         self._resultset = None
+        self._payload = None
+    @staticmethod
+    def _get_prefetch(source, use_mmap=False, payload_cache=None, payload=None):
+        '''
+        Args:
+            source: String|ArchiveMember    => path to prefetch file or member of archive to parse
+            use_mmap: Boolean               => whether to memory map source (if on disk)
+            payload_cache: String           => path to cache directory of decompressed payloads
+            payload: ByteString             => decompressed contents of source, if already decompressed
+        Returns:
+            Prefetch
+            Unparsed prefetch file for source, read from its archive
+            into memory if source is an archive member
+        Preconditions:
+            source is of type String or ArchiveMember   (assumed True)
+            use_mmap is of type Boolean                 (assumed True)
+            payload_cache is of type String             (assumed True)
+            payload is of type ByteString               (assumed True)
+        '''
+        if payload_cache is not None:
+            payload_cache = PayloadCache(payload_cache)
+        if isinstance(source, ArchiveMember):
+            return Prefetch.from_bytes(source.read(), name=str(source), metadata=source.get_metadata(), payload_cache=payload_cache)
+        return Prefetch(source, use_mmap=use_mmap, payload_cache=payload_cache, payload=payload)
     @property
     def source(self):
         '''
@@ -54,6 +83,21 @@ class BaseParseTask(object):
         '''
         raise AttributeError('source attribute must be set in the constructor')
     @property
+    def payload(self):
+        '''
+        @payload.getter
+        '''
+        return self._payload
+    @payload.setter
+    def payload(self, value):
+        '''
+        @payload.setter
+        Preconditions:
+            value is of type ByteString (decompressed contents of source) or None
+        '''
+        assert value is None or isinstance(value, (bytes, bytearray)), 'Value is not of type ByteString'
+        self._payload = value
+    @property
     def resultset(self):
         '''
         @resultset.getter
@@ -155,6 +199,7 @@ class BaseParseFileOutputTask(BaseParseTask):
             if len(self.result_set) > 0:
                 successful_results = 0
                 with open(target_file, 'a') as f:
+                    offset = f.tell()
                     for result in self.result_set:
                         try:
                             if 'sep' in self.context:
@@ -164,6 +209,9 @@ class BaseParseFileOutputTask(BaseParseTask):
                             successful_results += 1
                         except Exception as e:
                             Logger.error('Failed to write result for source file %s (%s)'%(self.source, str(e)))
+                    length = f.tell() - offset
+                with open(get_index_path(target_file), 'a') as index_file:
+                    index_file.write('%d %d %d\n'%(self.nodeidx, offset, length))
         except Exception as e:
             Logger.error('Failed to write results for source file %s (%s)'%(self.source, str(e)))
         else:
@@ -175,56 +223,140 @@ class ParseCSVTask(BaseParseFileOutputTask):
     '''
     Class for parsing single Prefetch file to CSV format
     '''
+    _ENTRY_SECTIONS = dict(\
+        file_metrics=('file_metrics', 'filename_strings'),
+        trace_chains=('trace_chains',)\
+    )
+    _ENTRY_COLUMNS = dict(\
+        file_metrics=(\
+            'StartTime', 
+            'Duration', 
+            'AverageDuration', 
+            'FileNameOffset', 
+            'FileNameLength', 
+            'FileReference.SegmentNumber', 
+            'FileReference.SequenceNumber'\
+        ),
+        trace_chains=('NextEntryIndex', 'TotalBlockLoadCount', 'SampleDuration')\
+    )
+
+    @staticmethod
+    def _get_columns(entries, names):
+        '''
+        Args:
+            entries: numpy.ndarray|List<BaseRecord> => file metrics or trace chains entries
+            names: Iterable<String>                 => names of columns to get (see: src.structures.columnar.to_columns)
+        Returns:
+            List<List<Any>>
+            Each named column of entries, read from the columns of entries directly if they
+            were decoded into a structured array (see: Prefetch.parse with columnar=True),
+            or from each record otherwise (i.e. if NumPy is not installed)
+        Preconditions:
+            entries is of type numpy.ndarray or List<BaseRecord>    (assumed True)
+            names is of type Iterable<String>                       (assumed True)
+        '''
+        if pfcolumnar.np is not None and isinstance(entries, pfcolumnar.np.ndarray):
+            return pfcolumnar.to_columns(entries, names)
+        columns = list()
+        for name in names:
+            column = list()
+            for entry in entries:
+                value = entry
+                for field in name.split('.'):
+                    value = getattr(value, field, None)
+                column.append(value)
+            columns.append(column)
+        return columns
+    def _extract_entries(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Add one result to the result set for each entry of the section named by
+            self.context.info_type (file_metrics or trace_chains), with the entries
+            decoded into a structured array and written out a column at a time 
+            (see: ParseCSVTask._get_columns), so no object is created per entry
+        Preconditions:
+            self.context.info_type is a key of _ENTRY_SECTIONS  (assumed True)
+        '''
+        try:
+            pf = self._get_prefetch(self.source, use_mmap=self.context.get('mmap', False), payload_cache=self.context.get('payload_cache'), payload=self.payload)
+            pf.parse(sections=self._ENTRY_SECTIONS[self.context.info_type], columnar=True)
+        except Exception as e:
+            Logger.error('Failed to parse Prefetch file %s (%s)'%(self.source, str(e)))
+        else:
+            try:
+                entries = pf[self.context.info_type]
+                columns = [\
+                    [self.NULL if value is None else str(value) for value in column] \
+                    for column in self._get_columns(entries, self._ENTRY_COLUMNS[self.context.info_type])\
+                ]
+                if self.context.info_type == 'file_metrics':
+                    columns.append([str(fstring) for fstring in pf.get('filename_strings') or [self.NULL] * len(entries)])
+                prefix = [\
+                    str(self.nodeidx),
+                    str(pf.header.ExecutableName if hasattr(pf.header, 'ExecutableName') else self.NULL),
+                    str(pf.header.PrefetchHash if hasattr(pf.header, 'PrefetchHash') else self.NULL)\
+                ]
+                for entryidx, row in enumerate(zip(*columns)):
+                    self.result_set.append(prefix + [str(entryidx)] + list(row))
+            except Exception as e:
+                Logger.error('Failed to create CSV output record for source file %s (%s)'%(self.source, str(e)))
     def extract_resultset(self, worker):
         '''
         @BaseParseTask.extract_resultset
         '''
         self.result_set = list()
-        if self.context.info_type == 'summary':
+        if self.context.info_type in self._ENTRY_SECTIONS:
+            self._extract_entries()
+        elif self.context.info_type == 'summary':
             try:
-                pf = Prefetch(self.source)
-                pf.parse()
+                pf = self._get_prefetch(self.source, use_mmap=self.context.get('mmap', False), payload_cache=self.context.get('payload_cache'), payload=self.payload)
+                pf.parse(sections=self.context.get('sections'), lazy=True)
             except Exception as e:
                 Logger.error('Failed to parse Prefetch file %s (%s)'%(self.source, str(e)))
             else:
                 try:
+                    file_info = getattr(pf, 'file_info', None)
+                    volumes_info = getattr(pf, 'volumes_info', None) or list()
+                    file_metrics = getattr(pf, 'file_metrics', None)
                     result = [\
                         str(self.nodeidx),
                         str(pf.header.Version),
                         str(pf.header.Signature),
                         str(pf.header.ExecutableName if hasattr(pf.header, 'ExecutableName') else self.NULL),
                         str(pf.header.PrefetchHash if hasattr(pf.header, 'PrefetchHash') else self.NULL),
-                        str(pf.file_info.SectionAEntriesCount),
-                        str(pf.file_info.SectionBEntriesCount),
-                        str(pf.file_info.SectionCLength),
-                        str(pf.file_info.SectionDEntriesCount),
-                        pf.file_info.LastExecutionTime[0].strftime('%Y-%m-%d %H:%M:%S.%f%z') \
-                            if len(pf.file_info.LastExecutionTime) > 0 and pf.file_info.LastExecutionTime[0] is not None \
+                        str(file_info.SectionAEntriesCount) if file_info is not None else self.NULL,
+                        str(file_info.SectionBEntriesCount) if file_info is not None else self.NULL,
+                        str(file_info.SectionCLength) if file_info is not None else self.NULL,
+                        str(file_info.SectionDEntriesCount) if file_info is not None else self.NULL,
+                        epoch_us_to_datetime(file_info.LastExecutionTimestamp[0]).strftime('%Y-%m-%d %H:%M:%S.%f%z') \
+                            if file_info is not None and len(file_info.LastExecutionTimestamp) > 0 \
+                                and epoch_us_to_datetime(file_info.LastExecutionTimestamp[0]) is not None \
                             else self.NULL,
-                        str(pf.file_info.ExecutionCount),
+                        str(file_info.ExecutionCount) if file_info is not None else self.NULL,
                         '|'.join([\
                             volumes_info_entry.VolumeDevicePath \
                             if hasattr(volumes_info_entry, 'VolumeDevicePath') else self.NULL \
-                            for volumes_info_entry in pf.volumes_info\
+                            for volumes_info_entry in volumes_info\
                         ]),
                         '|'.join([\
                             volumes_info_entry.VolumeCreateTime.strftime('%Y-%m-%d %H:%M:%S.%f%z') \
                             if hasattr(volumes_info_entry, 'VolumeCreateTime') else self.NULL \
-                            for volumes_info_entry in pf.volumes_info\
+                            for volumes_info_entry in volumes_info\
                         ]),
                         '|'.join([\
                             str(volumes_info_entry.VolumeSerialNumber) \
                             if hasattr(volumes_info_entry, 'VolumeSerialNumber') else self.NULL \
-                            for volumes_info_entry in pf.volumes_info\
+                            for volumes_info_entry in volumes_info\
                         ])\
                     ]
-                    for attribute_key in ['file_metrics', 'trace_chains']:
-                        attribute = getattr(pf, attribute_key)
-                        result.append(str(len(attribute)) if attribute is not None else self.NULL)
+                    result.append(str(len(file_metrics)) if file_metrics is not None else self.NULL)
+                    result.append(str(file_info.SectionBEntriesCount) if file_info is not None else self.NULL)
                     for attribute_key in ['file_references', 'directory_strings']:
-                        attribute = getattr(pf, attribute_key)
+                        attribute = getattr(pf, attribute_key, None) or list()
                         result.append('|'.join(str(len(attribute_entry)) for attribute_entry in attribute)) 
-                    result.append('|'.join(str(fstring) for fstring in pf.filename_strings))
+                    result.append('|'.join(str(fstring) for fstring in (getattr(pf, 'filename_strings', None) or list())))
                     self.result_set.append(result)
                 except Exception as e:
                     Logger.error('Failed to create CSV output record for source file %s (%s)'%(self.source, str(e)))
@@ -233,18 +365,20 @@ class ParseBODYTask(BaseParseFileOutputTask):
     '''
     Task class for parsing single Prefetch file to BODY format
     '''
+    _MIN_TIMESTAMP = (datetime(1602,1,1, tzinfo=timezone.utc) - datetime(1970,1,1, tzinfo=timezone.utc)) // timedelta(microseconds=1)
+
     @staticmethod
-    def to_timestamp(dt):
+    def to_timestamp(epoch_us):
         '''
         Args:
-            dt: DateTime<UTC>   => datetime object to convert
+            epoch_us: Integer   => microseconds since the Unix epoch
         Returns:
             Float
-            Datetime object converted to Unix epoch time
+            epoch_us converted to Unix epoch time
         Preconditions:
-            dt is timezone-aware timestamp with timezone UTC
+            epoch_us is of type Integer (assumed True)
         '''
-        return (dt - datetime(1970,1,1, tzinfo=timezone.utc)) / timedelta(seconds=1)
+        return epoch_us / 1e6
 
     def extract_resultset(self, worker):
         '''
@@ -252,17 +386,17 @@ class ParseBODYTask(BaseParseFileOutputTask):
         '''
         self.result_set = list()
         try:
-            pf = Prefetch(self.source)
-            pf.parse()
+            pf = self._get_prefetch(self.source, use_mmap=self.context.get('mmap', False), payload_cache=self.context.get('payload_cache'), payload=self.payload)
+            pf.parse(sections=self.context.get('sections'), lazy=True)
         except Exception as e:
             Logger.error('Failed to parse Prefetch file %s (%s)'%(self.source, str(e)))
         else:
             try:
-                if len(pf.file_info.LastExecutionTime) > 0:
-                    file_name = path.basename(self.source)
-                    file_size = stat(self.source).st_size
-                    for execution_time in pf.file_info.LastExecutionTime:
-                        if execution_time.year != 1601:
+                if getattr(pf, 'file_info', None) is not None and len(pf.file_info.LastExecutionTimestamp) > 0:
+                    file_name = path.basename(str(self.source))
+                    file_size = self.source.size if isinstance(self.source, ArchiveMember) else stat(self.source).st_size
+                    for execution_time in pf.file_info.LastExecutionTimestamp:
+                        if execution_time >= self._MIN_TIMESTAMP:
                             result = [\
                                 str(self.nodeidx),
                                 self.NULL,
@@ -292,8 +426,8 @@ class ParseJSONTask(BaseParseFileOutputTask):
         '''
         self.result_set = list()
         try:
-            pf = Prefetch(self.source)
-            result = dumps(pf.parse().serialize(), sort_keys=True, indent=(2 if self.context.pretty else None))
+            pf = self._get_prefetch(self.source, use_mmap=self.context.get('mmap', False), payload_cache=self.context.get('payload_cache'), payload=self.payload)
+            result = dumps(pf.parse(sections=self.context.get('sections')).serialize(), sort_keys=True, indent=(2 if self.context.pretty else None))
         except Exception as e:
             Logger.error('Failed to parse Prefetch file %s (%s)'%(self.source, str(e)))
         else:
@@ -323,8 +457,9 @@ class ParseDBTaskStage2(BaseParseTask):
                     Logger.error('Failed to get header information from %s (%s)'%(pf._filepath, str(e)))
                 else:
                     try:
-                        ledger.header.file_info = db.FileInformation().populate_fields(pf.file_info)
-                        for last_execution_time in pf.file_info.LastExecutionTime:
+                        if pf.get('file_info') is not None:
+                            ledger.header.file_info = db.FileInformation().populate_fields(pf.file_info)
+                        for last_execution_time in (pf.file_info.LastExecutionTime if pf.get('file_info') is not None else list()):
                             try:
                                 ledger.header.file_info.last_execution_times.append(\
                                     db.LastExecutionTime(last_execution_time=last_execution_time)\
@@ -335,13 +470,16 @@ class ParseDBTaskStage2(BaseParseTask):
                         Logger.error('Failed to get file information from %s (%s)'%(pf._filepath, str(e)))
                     else:
                         try:
-                            for file_metric, file_name in zip(pf.file_metrics, pf.filename_strings):
+                            filename_strings = pf.get('filename_strings') or list()
+                            for idx, file_metric in enumerate(pf.get('file_metrics') or list()):
+                                file_name = filename_strings[idx] if idx < len(filename_strings) else None
                                 try:
-                                    file_reference = file_metric.FileReference
-                                    del file_metric.FileReference
-                                    db_file_metric = db.FileMetric().populate_fields(file_metric)
+                                    db_file_metric = db.FileMetric().populate_fields(\
+                                        dict((key, value) for key, value in file_metric.items() if key != 'FileReference')\
+                                    )
                                     db_file_metric.file_name = db.FileMetricsName(file_name=file_name)
-                                    db_file_metric.file_reference = db.FileReference().populate_fields(file_reference)
+                                    if 'FileReference' in file_metric:
+                                        db_file_metric.file_reference = db.FileReference().populate_fields(file_metric.FileReference)
                                     ledger.header.file_metrics.append(db_file_metric)
                                 except Exception as e:
                                     Logger.error('Failed to add file metrics entry from %s (%s)'%(pf._filepath, str(e)))
@@ -349,7 +487,7 @@ class ParseDBTaskStage2(BaseParseTask):
                             Logger.error('Failed to get file metrics information from %s (%s)'%(pf._filepath, str(e)))
                         else:
                             try:
-                                for trace_chain in pf.trace_chains:
+                                for trace_chain in (pf.get('trace_chains') or list()):
                                     try:
                                         ledger.header.trace_chains.append(\
                                             db.TraceChain().populate_fields(trace_chain)\
@@ -360,9 +498,13 @@ class ParseDBTaskStage2(BaseParseTask):
                                 Logger.error('Failed to get trace chains information from %s (%s)'%(pf._filepath, str(e)))
                             else:
                                 try:
-                                    for volumes_info, file_references, directory_strings in zip(pf.volumes_info, pf.file_references, pf.directory_strings):
+                                    file_references_list = pf.get('file_references') or list()
+                                    directory_strings_list = pf.get('directory_strings') or list()
+                                    for idx, volumes_info in enumerate(pf.get('volumes_info') or list()):
+                                        file_references = file_references_list[idx].References if idx < len(file_references_list) else list()
+                                        directory_strings = directory_strings_list[idx] if idx < len(directory_strings_list) else list()
                                         db_volumes_info = db.VolumesInformation().populate_fields(volumes_info)
-                                        for file_reference in file_references.References:
+                                        for file_reference in file_references:
                                             try:
                                                 db_volumes_info.file_references.append(\
                                                     db.FileReference().populate_fields(file_reference)\
@@ -410,15 +552,23 @@ class ParseDBTaskStage1(BaseParseTask):
     '''
     Task class to parse single Prefetch file in preparation for insertion into DB
     '''
+    def __init__(self, source, sections=None, mmap=False, cache=None, payload_cache=None):
+        super(ParseDBTaskStage1, self).__init__(source)
+        self._sections = sections
+        self._mmap = mmap
+        self._cache = cache
+        self._payload_cache = payload_cache
     def extract_resultset(self, worker):
         '''
         @BaseParseTask.extract_resultset
         '''
         self.result_set = list()
         try:
-            pf = Prefetch(self.source)
-            pf.parse()
-            pf._stream = None
+            pf = self._get_prefetch(self.source, use_mmap=self._mmap, payload_cache=self._payload_cache, payload=self.payload)
+            pf.parse(sections=self._sections, lazy=True)
+            pf.get_metadata(cache=get_metadata_cache(self._cache))
+            pf.parse_remaining()
+            pf._release_source()
         except Exception as e:
             Logger.error('Failed to parse Prefetch file %s (%s)'%(self.source, str(e)))
         else:
@@ -431,3 +581,77 @@ class ParseDBTaskStage1(BaseParseTask):
         @BaseParseTask.process_resultset
         '''
         return self.result_set
+
+class DecompressTask(BaseParseTask):
+    '''
+    Task class to decompress single MAM-compressed Prefetch file ahead of
+    the task(s) that parse it, so that decompression and parsing can run
+    in separate worker pools
+    '''
+    def __init__(self, source, parse_tasks, mmap=False, payload_cache=None):
+        super(DecompressTask, self).__init__(source)
+        self._parse_tasks = parse_tasks
+        self._mmap = mmap
+        self._payload_cache = payload_cache
+    def extract_resultset(self, worker):
+        '''
+        @BaseParseTask.extract_resultset
+        '''
+        self.result_set = list()
+        try:
+            pf = self._get_prefetch(self.source, use_mmap=self._mmap, payload_cache=self._payload_cache)
+            payload = bytes(pf.get_buffer())
+        except Exception as e:
+            Logger.error('Failed to decompress Prefetch file %s (%s)'%(self.source, str(e)))
+            payload = None
+        for parse_task in self._parse_tasks:
+            parse_task.payload = payload
+            self.result_set.append(parse_task)
+    def process_resultset(self, worker):
+        '''
+        @BaseParseTask.process_resultset
+        '''
+        return self.result_set
+
+class DecompressFileTask(BaseParseTask):
+    '''
+    Task class to write single MAM-compressed Prefetch file to target
+    as a plain (SCCA) prefetch file
+    '''
+    def __init__(self, source, target, copy_all=False, payload_cache=None):
+        super(DecompressFileTask, self).__init__(source)
+        self._target = target
+        self._copy_all = copy_all
+        self._payload_cache = payload_cache
+    def extract_resultset(self, worker):
+        '''
+        @BaseParseTask.extract_resultset
+        '''
+        self.result_set = list()
+        try:
+            pf = self._get_prefetch(self.source, use_mmap=True, payload_cache=self._payload_cache)
+            if not self._copy_all and not pf._is_compressed(pf._get_raw_buffer()):
+                Logger.info('Skipping uncompressed Prefetch file %s'%self.source)
+                return
+            makedirs(path.dirname(self._target), exist_ok=True)
+            temp_path = '%s.%d.tmp'%(self._target, getpid())
+            try:
+                with open(temp_path, 'wb') as target:
+                    for block in pf.iter_buffer():
+                        target.write(block)
+                replace(temp_path, self._target)
+            except:
+                if path.exists(temp_path):
+                    remove(temp_path)
+                raise
+        except Exception as e:
+            Logger.error('Failed to decompress Prefetch file %s to %s (%s)'%(self.source, self._target, str(e)))
+        else:
+            self.result_set.append(self._target)
+    def process_resultset(self, worker):
+        '''
+        @BaseParseTask.process_resultset
+        '''
+        if len(self.result_set) > 0:
+            Logger.info('Successfully wrote %s for source file %s'%(self.result_set[0], self.source))
+        return [True]
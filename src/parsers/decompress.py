@@ -8,7 +8,10 @@ import ctypes
 import os
 import struct
 
-#Windows-only utility to decompress MAM compressed files
+from .xpress import decompress_mam, iter_decompress_mam
+
+#Utility to decompress MAM compressed files, using ntdll on Windows and
+#the portable XPRESS Huffman decoder (see: src.parsers.xpress) elsewhere
 class DecompressWin10(object):
     def __init__(self):
         pass
@@ -18,8 +21,23 @@ class DecompressWin10(object):
         return hex((val + (1 << nbits)) % (1 << nbits))
 
     def decompress(self, infile):
+        """Decompress MAM compressed file at path infile."""
+        with open(infile, 'rb') as fin:
+            return self.decompress_buffer(fin.read())
+
+    def iter_decompress_buffer(self, buffer):
+        """Decompress MAM compressed buffer, yielding blocks as they are decompressed
+        (a single block when using ntdll, which only decompresses whole buffers)."""
+        if not hasattr(ctypes, 'windll'):
+            return iter_decompress_mam(buffer)
+        return iter((self.decompress_buffer(buffer),))
+
+    def decompress_buffer(self, buffer):
         """Utility core."""
 
+        if not hasattr(ctypes, 'windll'):
+            return decompress_mam(buffer)
+
         NULL = ctypes.POINTER(ctypes.c_uint)()
         SIZE_T = ctypes.c_uint
         DWORD = ctypes.c_uint32
@@ -37,60 +55,59 @@ class DecompressWin10(object):
         RtlGetCompressionWorkSpaceSize = \
             ctypes.windll.ntdll.RtlGetCompressionWorkSpaceSize
 
-        with open(infile, 'rb') as fin:
-            header = fin.read(8)
-            compressed = fin.read()
-
-            signature, decompressed_size = struct.unpack('<LL', header)
-            calgo = (signature & 0x0F000000) >> 24
-            crcck = (signature & 0xF0000000) >> 28
-            magic = signature & 0x00FFFFFF
-            if magic != 0x004d414d :
-                sys.exit('Wrong signature... wrong file?')
-
-            if crcck:
-                # I could have used RtlComputeCrc32.
-                file_crc = struct.unpack('<L', compressed[:4])[0]
-                crc = binascii.crc32(header)
-                crc = binascii.crc32(struct.pack('<L',0), crc)
-                compressed = compressed[4:]
-                crc = binascii.crc32(compressed, crc)          
-                if crc != file_crc:
-                    sys.exit('{} Wrong file CRC {0:x} - {1:x}!'.format(infile, crc, file_crc))
-
-            compressed_size = len(compressed)
-
-            ntCompressBufferWorkSpaceSize = ULONG()
-            ntCompressFragmentWorkSpaceSize = ULONG()
-
-            ntstatus = RtlGetCompressionWorkSpaceSize(USHORT(calgo),
-                ctypes.byref(ntCompressBufferWorkSpaceSize),
-                ctypes.byref(ntCompressFragmentWorkSpaceSize))
-
-            if ntstatus:
-                sys.exit('Cannot get workspace size, err: {}'.format(
-                    self.tohex(ntstatus, 32)))
-                    
-            ntCompressed = (UCHAR * compressed_size).from_buffer_copy(compressed)
-            ntDecompressed = (UCHAR * decompressed_size)()
-            ntFinalUncompressedSize = ULONG()
-            ntWorkspace = (UCHAR * ntCompressFragmentWorkSpaceSize.value)()
-            
-            ntstatus = RtlDecompressBufferEx(
-                USHORT(calgo),
-                ctypes.byref(ntDecompressed),
-                ULONG(decompressed_size),
-                ctypes.byref(ntCompressed),
-                ULONG(compressed_size),
-                ctypes.byref(ntFinalUncompressedSize),
-                ctypes.byref(ntWorkspace))
-
-            if ntstatus:
-                sys.exit('Decompression failed, err: {}'.format(
-                    tohex(ntstatus, 32)))
-
-            if ntFinalUncompressedSize.value != decompressed_size:
-                sys.exit('Decompressed with a different size than original!')
+        header = bytes(buffer[:8])
+        compressed = bytes(buffer[8:])
+
+        signature, decompressed_size = struct.unpack('<LL', header)
+        calgo = (signature & 0x0F000000) >> 24
+        crcck = (signature & 0xF0000000) >> 28
+        magic = signature & 0x00FFFFFF
+        if magic != 0x004d414d :
+            sys.exit('Wrong signature... wrong file?')
+
+        if crcck:
+            # I could have used RtlComputeCrc32.
+            file_crc = struct.unpack('<L', compressed[:4])[0]
+            crc = binascii.crc32(header)
+            crc = binascii.crc32(struct.pack('<L',0), crc)
+            compressed = compressed[4:]
+            crc = binascii.crc32(compressed, crc)          
+            if crc != file_crc:
+                sys.exit('Wrong file CRC {0:x} - {1:x}!'.format(crc, file_crc))
+
+        compressed_size = len(compressed)
+
+        ntCompressBufferWorkSpaceSize = ULONG()
+        ntCompressFragmentWorkSpaceSize = ULONG()
+
+        ntstatus = RtlGetCompressionWorkSpaceSize(USHORT(calgo),
+            ctypes.byref(ntCompressBufferWorkSpaceSize),
+            ctypes.byref(ntCompressFragmentWorkSpaceSize))
+
+        if ntstatus:
+            sys.exit('Cannot get workspace size, err: {}'.format(
+                self.tohex(ntstatus, 32)))
+                
+        ntCompressed = (UCHAR * compressed_size).from_buffer_copy(compressed)
+        ntDecompressed = (UCHAR * decompressed_size)()
+        ntFinalUncompressedSize = ULONG()
+        ntWorkspace = (UCHAR * ntCompressFragmentWorkSpaceSize.value)()
+        
+        ntstatus = RtlDecompressBufferEx(
+            USHORT(calgo),
+            ctypes.byref(ntDecompressed),
+            ULONG(decompressed_size),
+            ctypes.byref(ntCompressed),
+            ULONG(compressed_size),
+            ctypes.byref(ntFinalUncompressedSize),
+            ctypes.byref(ntWorkspace))
+
+        if ntstatus:
+            sys.exit('Decompression failed, err: {}'.format(
+                tohex(ntstatus, 32)))
+
+        if ntFinalUncompressedSize.value != decompressed_size:
+            sys.exit('Decompressed with a different size than original!')
 
         return bytearray(ntDecompressed)
 
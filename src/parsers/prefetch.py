@@ -23,9 +23,9 @@
 
 import logging
 Logger = logging.getLogger(__name__)
-from os import path
+from os import path, stat, fstat
 from io import BytesIO
-import inspect
+import mmap
 from construct.lib import Container
 import hashlib
 from datetime import datetime
@@ -33,367 +33,548 @@ from dateutil.tz import tzlocal, tzutc
 
 from .decompress import DecompressWin10
 import src.structures.prefetch as pfstructs
-from src.utils.time import WindowsTime
+import src.structures.bulk as pfbulk
+import src.structures.columnar as pfcolumnar
+from src.structures.records import BaseRecord
+from src.utils.strings import STRING_TABLE
+
+def _topological_order(sections, dependencies):
+    '''
+    Args:
+        sections: Iterable<String>                          => names of sections to order
+        dependencies: Dict<String, Tuple<String>>           => sections each section depends on
+    Returns:
+        Tuple<String>
+        Sections ordered such that each section comes after every section it depends on,
+        keeping the order of sections otherwise
+    Preconditions:
+        sections is of type Iterable<String>                (assumed True)
+        dependencies is of type Dict<String, Tuple<String>> (assumed True)
+        dependencies does not contain a cycle
+    '''
+    ordered = list()
+    remaining = list(sections)
+    while len(remaining) > 0:
+        ready = [\
+            section for section in remaining \
+            if all(dependency in ordered for dependency in dependencies.get(section, ()))\
+        ]
+        assert len(ready) > 0, 'Section dependencies contain a cycle (%s)'%', '.join(remaining)
+        ordered.extend(ready)
+        remaining = [section for section in remaining if section not in ready]
+    return tuple(ordered)
 
 class Prefetch(Container):
     '''
     Class for parsing Windows prefetch files
     '''
+    SECTIONS = (\
+        'header',
+        'file_info',
+        'file_metrics',
+        'filename_strings',
+        'trace_chains',
+        'volumes_info',
+        'file_references',
+        'directory_strings'\
+    )
+    _SECTION_DEPENDENCIES = dict(\
+        header=(),
+        file_info=('header',),
+        file_metrics=('header', 'file_info'),
+        filename_strings=('header', 'file_info', 'file_metrics'),
+        trace_chains=('header', 'file_info'),
+        volumes_info=('header', 'file_info'),
+        file_references=('file_info', 'volumes_info'),
+        directory_strings=('file_info', 'volumes_info')\
+    )
+    _STRING_TABLE = STRING_TABLE
+    _COLUMNAR_SECTIONS = dict(\
+        file_metrics='file_metrics_columns',
+        trace_chains='trace_chains_columns'\
+    )
+    _SECTION_ORDER = _topological_order(SECTIONS, _SECTION_DEPENDENCIES)
+    _HASH_READ_SIZE = 1024 * 1024
+    _STRUCTURE_DEPENDENCIES = dict(\
+        _SECTION_DEPENDENCIES,
+        file_metrics_columns=_SECTION_DEPENDENCIES['file_metrics'],
+        trace_chains_columns=_SECTION_DEPENDENCIES['trace_chains']\
+    )
 
-    def __init__(self, filepath, load=False):
+    @classmethod
+    def from_bytes(cls, data, name='<bytes>', metadata=None, load=False, payload_cache=None):
+        '''
+        Args:
+            data: ByteString            => (possibly compressed) contents of prefetch file
+            name: String                => name (i.e. archive path) to report for prefetch file
+            metadata: Dict<String, Any> => filesystem metadata of prefetch file, if known 
+                                           (modify_time, access_time and/or create_time)
+            load: Boolean               => whether to parse prefetch file immediately
+            payload_cache: PayloadCache => cache of decompressed payloads of MAM-compressed files
+                                           (see: src.utils.cache.PayloadCache)
+        Returns:
+            Prefetch
+            Prefetch parser over data rather than a file on disk
+        Preconditions:
+            data is of type ByteString              (assumed True)
+            name is of type String                  (assumed True)
+            metadata is of type Dict<String, Any>   (assumed True)
+            load is of type Boolean                 (assumed True)
+        '''
+        prefetch = cls(name, payload_cache=payload_cache)
+        prefetch._data = data
+        prefetch._source_metadata = metadata
+        if load:
+            prefetch.parse()
+        return prefetch
+    @classmethod
+    def from_fileobj(cls, fileobj, name=None, metadata=None, load=False, payload_cache=None):
+        '''
+        Args:
+            fileobj: File               => binary file-like object to read prefetch file from
+            name: String                => name to report for prefetch file (default: fileobj.name)
+            @Prefetch.from_bytes
+        Returns:
+            Prefetch
+            Prefetch parser over contents of fileobj
+        Preconditions:
+            fileobj is readable binary file-like object (assumed True)
+            @Prefetch.from_bytes
+        '''
+        if name is None:
+            name = str(getattr(fileobj, 'name', '<fileobj>'))
+        return cls.from_bytes(fileobj.read(), name=name, metadata=metadata, load=load, payload_cache=payload_cache)
+
+    def __init__(self, filepath, load=False, use_mmap=False, payload_cache=None, payload=None):
         super(Prefetch, self).__init__()
-        self._stream = None
+        self._buffer = None
+        self._raw_buffer = None
+        self._metadata = None
         self._filepath = filepath
+        self._use_mmap = use_mmap
+        self._payload_cache = payload_cache
+        self._payload = payload
+        self._data = None
         if load:
             self.parse()
-    def _get_version(self):
+    def __missing__(self, key):
         '''
         Args:
-            N/A
+            key: String => name of attribute being accessed
         Returns:
-            ByteString
-            Prefetch version if successful, None otherwise
+            Any
+            Section key parsed from the persisted buffer if it is pending
+            (see: Prefetch.parse with lazy=True)
         Preconditions:
-            N/A
+            key is of type String   (assumed True)
+        '''
+        pending = dict.get(self, '_pending')
+        if pending is None or key not in pending:
+            raise KeyError(key)
+        structure = pending.pop(key)
+        self[key] = self.parse_structure(structure)
+        if len(pending) == 0:
+            self._release_buffer()
+            del self['_pending']
+        return dict.__getitem__(self, key)
+    @staticmethod
+    def has_signature(filepath):
         '''
-        with open(self._filepath, 'rb') as pf:
-            try:
-                version = pfstructs.PrefetchVersion.parse_stream(pf)
-            except:
-                version = None
-        return version
-    def _clean_transform(self, value, serialize=False):
+        Args:
+            filepath: String    => path to file to check
+        Returns:
+            Boolean
+            True if the first 8 bytes of filepath contain an uncompressed (SCCA) or
+            Win10 MAM-compressed (MAM\\x04, or MAM\\x84 with CRC) prefetch signature, 
+            False otherwise (or if filepath could not be read, or is too short
+            to hold the full 8-byte MAM header)
+        Preconditions:
+            filepath is of type String  (assumed True)
+        '''
+        try:
+            with open(filepath, 'rb') as pf:
+                signature = pf.read(8)
+        except (IOError, OSError):
+            return False
+        return signature[4:8] == b'SCCA' or \
+            (len(signature) == 8 and signature[:3] == b'MAM' and signature[3] & 0x0F == 4)
+    @classmethod
+    def is_compressed_file(cls, filepath):
         '''
         Args:
-            value: Any  => value to be converted
+            filepath: String    => path to file to check
         Returns:
-            Any
-            Raw value if it is not of type Container, else recursively removes
-            any key beginning with 'Raw'
+            Boolean
+            True if filepath is a Win10 MAM-compressed prefetch file (see: Prefetch._is_compressed),
+            False otherwise (or if filepath could not be read)
         Preconditions:
-            N/A
+            filepath is of type String  (assumed True)
         '''
-        if issubclass(type(value), Container):
-            cleaned_value = Container(value)
-            if '_filepath' in cleaned_value:
-                del cleaned_value['_filepath']
-            for key in cleaned_value:
-                if key.startswith('Raw') or key.startswith('_'):
-                    del cleaned_value[key]
-                else:
-                    cleaned_value[key] = self._clean_transform(cleaned_value[key], serialize)
-            return cleaned_value
-        elif isinstance(value, list):
-            return list(map(lambda entry: self._clean_transform(entry, serialize), value))
-        elif isinstance(value, datetime) and serialize:
-            return value.strftime('%Y-%m-%d %H:%M:%S.%f%z')
-        else:
-            return value
-    def _prepare_kwargs(self, structure_parser, **kwargs):
+        try:
+            with open(filepath, 'rb') as pf:
+                return cls._is_compressed(pf.read(8))
+        except (IOError, OSError):
+            return False
+    @staticmethod
+    def _is_compressed(buffer):
         '''
         Args:
-            structure_parser: Callable  => function to prepare kwargs for
-            kwargs: Dict<String, Any>   => kwargs to prepare
+            buffer: ByteString|memoryview   => raw contents of prefetch file
         Returns:
-            Dict<String, Any>
-            Same set of keyword arguments but with values filled in
-            for kwargs supplied as None with attribute values from self
-            NOTE:
-                This function uses the inspect module to get the keyword
-                arguments for the given structure parser.  I know this is weird
-                and non-standard OOP, and is subject to change int the future,
-                but it works as a nice abstraction on the various structure parsers 
-                for now.
+            Boolean
+            True if buffer contains Win10 MAM-compressed prefetch file, False otherwise
         Preconditions:
-            structure_parser is callable that takes 0 or more keyword arguments
-            Only keyword arguments supplied to function
+            buffer is of type ByteString or memoryview  (assumed True)
         '''
-        argspec = inspect.getargspec(structure_parser)
-        kwargs_keys = argspec.args[(len(argspec.args) - len(argspec.defaults))+1:]
-        prepared_kwargs = dict()
-        for key in kwargs_keys:
-            if key in kwargs:
-                if kwargs[key] is None:
-                    prepared_kwargs[key] = getattr(\
-                        self, 
-                        key if key != 'stream' else '_stream', 
-                        None\
-                    )
-                    if prepared_kwargs[key] is None:
-                        raise Exception('Attribute %s was no provided and has not been parsed'%key)
-                else:
-                    prepared_kwargs[key] = kwargs[key]
-            else:
-                prepared_kwargs[key] = getattr(\
-                    self, 
-                    key if key != 'stream' else '_stream', 
-                    None\
-                )
-        return prepared_kwargs
-    def _parse_directory_strings(self, original_position, stream=None, file_info=None, volumes_info=None):
-        '''
-        Args:
-            original_position: Integer                  => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO               => stream to read from
-            file_info: Container                        => file information parsed from stream
-            volumes_info: List<Container<String, Any>>  => volumes information parsed from stream
+        return bytes(buffer[4:8]) != b'SCCA' and bytes(buffer[:3]) == b'MAM'
+    @classmethod
+    def _resolve_sections(cls, sections=None):
+        '''
+        Args:
+            sections: Iterable<String>  => names of sections to parse (None for all sections)
         Returns:
-            List<Container<String, Integer|String>>
-            List of directory strings and their lengths
+            Tuple<String>
+            Requested sections plus every section they depend on,
+            in the order they must be parsed
         Preconditions:
-            original_position is of type Integer                (assumed True)
-            stream is of type TextIOWrapper or BytesIO          (assumed True)
-            file_info is of type Container                      (assumed True)
-            volume_info is of type List<Container<String, Any>> (assumed True)
+            sections is of type Iterable<String>    (assumed True)
+            each section in sections is in Prefetch.SECTIONS
+        '''
+        if sections is None:
+            return cls._SECTION_ORDER
+        resolved = set()
+        unresolved = list(sections)
+        while len(unresolved) > 0:
+            section = unresolved.pop()
+            assert section in cls._SECTION_DEPENDENCIES, 'Section %s is not a known section'%section
+            if section not in resolved:
+                resolved.add(section)
+                unresolved.extend(cls._SECTION_DEPENDENCIES[section])
+        return tuple(section for section in cls._SECTION_ORDER if section in resolved)
+    def _intern_strings(self, strings):
         '''
-        try:
-            directory_strings = list()
-            for volumes_info_entry in volumes_info:
-                directory_strings_entry = list()
-                stream.seek(file_info.SectionDOffset + volumes_info_entry.SectionFOffset)
-                for i in range(volumes_info_entry.SectionFStringsCount):
-                    try:
-                        directory_string_length = pfstructs.Int16ul.parse_stream(stream)
-                        directory_string = stream.read(directory_string_length * 2 + 2).decode('UTF16')
-                        directory_strings_entry.append(directory_string.strip('\x00'))
-                    except Exception as e:
-                        Logger.error('Error parsing directory strings entry (%s)'%str(e))
-                        directory_strings_entry.append(None)
-                directory_strings.append(directory_strings_entry)
-            return self._clean_transform(directory_strings)
-        finally:
-            stream.seek(original_position)
-    def _parse_file_references(self, original_position, stream=None, file_info=None, volumes_info=None):
+        Args:
+            strings: List<String>   => strings to intern
+        Returns:
+            List<String>
+            strings interned in Prefetch._STRING_TABLE (see: src.utils.strings.STRING_TABLE),
+            or strings unchanged if interning is disabled (Prefetch._STRING_TABLE is None)
+        Preconditions:
+            strings is of type List<String> (assumed True)
+        '''
+        if self._STRING_TABLE is None:
+            return strings
+        return self._STRING_TABLE.intern_all(strings)
+    @classmethod
+    def _serialize_value(cls, value):
         '''
         Args:
-            original_position: Integer                  => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO               => stream to read from
-            file_info: Container                        => file information parsed from stream
-            volumes_info: List<Container<String, Any>>  => volumes information parsed from stream
+            value: Any  => parsed value to serialize
         Returns:
-            List<Container<String, Any>>
-            List of file references (see: src.structures.prefetch.PrefetchFileReferences)
+            Any
+            Value with records converted to Containers, structured arrays
+            converted to lists of Containers and datetimes formatted as strings
+            NOTE:
+                Parsed values never contain raw fields (they are dropped when
+                decoded), so this is a single pass that builds the output
+                directly rather than copying and then pruning it
         Preconditions:
-            original_position is of type Integer                (assumed True)
-            stream is of type TextIOWrapper or BytesIO          (assumed True)
-            file_info is of type Container                      (assumed True)
-            volume_info is of type List<Container<String, Any>> (assumed True)
+            N/A
         '''
-        try:
-            file_refs = list()
-            for volumes_info_entry in volumes_info:
+        if isinstance(value, BaseRecord):
+            return Container((key, cls._serialize_value(entry)) for key, entry in value.items())
+        elif isinstance(value, list):
+            return [cls._serialize_value(entry) for entry in value]
+        elif isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f%z')
+        elif pfcolumnar.np is not None and isinstance(value, pfcolumnar.np.ndarray):
+            return pfcolumnar.to_containers(value)
+        return value
+    def _parse_directory_strings(self, buffer=None, file_info=None, volumes_info=None):
+        '''
+        Args:
+            buffer: memoryview                    => buffer to read from
+            file_info: FileInformation            => file information parsed from buffer
+            volumes_info: List<VolumeInformation> => volumes information parsed from buffer
+        Returns:
+            List<List<String>>
+            List of directory strings for each volume
+        Preconditions:
+            buffer is of type memoryview                   (assumed True)
+            file_info is of type FileInformation           (assumed True)
+            volume_info is of type List<VolumeInformation> (assumed True)
+        '''
+        directory_strings = list()
+        for volumes_info_entry in volumes_info:
+            directory_strings_entry = list()
+            offset = file_info.SectionDOffset + volumes_info_entry.SectionFOffset
+            for i in range(volumes_info_entry.SectionFStringsCount):
                 try:
-                    stream.seek(file_info.SectionDOffset + volumes_info_entry.SectionEOffset)
-                    file_refs_entry = pfstructs.PrefetchFileReferences.parse_stream(stream)
-                    file_refs_entry.References = list(map(lambda ref: Container(**ref), file_refs_entry.References))
-                    file_refs.append(file_refs_entry)
+                    directory_string_length = pfstructs.Int16ul.parse(buffer[offset:offset + 2])
+                    offset += 2
+                    directory_string = bytes(buffer[offset:offset + directory_string_length * 2 + 2]).decode('UTF16')
+                    offset += directory_string_length * 2 + 2
+                    directory_strings_entry.append(directory_string.strip('\x00'))
                 except Exception as e:
-                    Logger.error('Error parsing file_refs_entry (%s)'%str(e))
-                    file_refs.append(None)
-            return self._clean_transform(file_refs)
-        finally:
-            stream.seek(original_position)
-    def _parse_volumes_info(self, original_position, stream=None, header=None, file_info=None):
+                    Logger.error('Error parsing directory strings entry (%s)'%str(e))
+                    directory_strings_entry.append(None)
+            directory_strings.append(self._intern_strings(directory_strings_entry))
+        return directory_strings
+    def _parse_file_references(self, buffer=None, file_info=None, volumes_info=None):
         '''
         Args:
-            original_position: Integer      => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO   => stream to read from
-            header: Container               => prefetch file header information parsed from stream
-            file_info: Container            => file information parsed from stream
+            buffer: memoryview                    => buffer to read from
+            file_info: FileInformation            => file information parsed from buffer
+            volumes_info: List<VolumeInformation> => volumes information parsed from buffer
         Returns:
-            List<Container<String, Any>>
-            Prefetch file volumes information (see src.structures.prefetch.PrefetchVolumeInformation*)
+            List<FileReferences>
+            List of file references (see: src.structures.bulk.decode_file_references)
         Preconditions:
-            original_position is of type Integer        (assumed True)
-            stream is of type TextIOWrapper or BytesIO  (assumed True)
-            header is of type Container                 (assumed True)
-            file_info is of type Container              (assumed True)
+            buffer is of type memoryview                   (assumed True)
+            file_info is of type FileInformation           (assumed True)
+            volume_info is of type List<VolumeInformation> (assumed True)
         '''
-        try:
-            stream.seek(file_info.SectionDOffset)
-            if header.Version == 'XP':
-                PrefetchVolumeInformation = pfstructs.PrefetchVolumeInformation17
-            elif header.Version == 'SEVEN':
-                PrefetchVolumeInformation = pfstructs.PrefetchVolumeInformation23
-            elif header.Version == 'EIGHT':
-                PrefetchVolumeInformation = pfstructs.PrefetchVolumeInformation26
-            else:
-                PrefetchVolumeInformation = pfstructs.PrefetchVolumeInformation30
-            volumes_info = list()
-            for i in range(file_info.SectionDEntriesCount):
-                volumes_info_entry = PrefetchVolumeInformation.parse_stream(stream)
-                volumes_info_position = stream.tell()
-                volumes_info_entry.VolumeCreateTime = WindowsTime(volumes_info_entry.RawVolumeCreateTime).parse()
-                stream.seek(file_info.SectionDOffset + volumes_info_entry.VolumeDevicePathOffset)
-                volumes_info_entry.VolumeDevicePath = pfstructs.PaddedString(\
-                        volumes_info_entry.VolumeDevicePathLength, \
-                        encoding='utf8').parse(\
-                            stream.read(volumes_info_entry.VolumeDevicePathLength*2).replace(b'\x00', b'')\
-                        )
-                volumes_info.append(volumes_info_entry)
-                stream.seek(volumes_info_position)
-            return self._clean_transform(volumes_info)
-        finally:
-            stream.seek(original_position)
-    def _parse_filename_strings(self, original_position, stream=None, header=None, file_info=None, file_metrics=None):
+        file_refs = list()
+        for volumes_info_entry in volumes_info:
+            try:
+                file_refs.append(pfbulk.decode_file_references(\
+                    buffer, 
+                    file_info.SectionDOffset + volumes_info_entry.SectionEOffset, 
+                    volumes_info_entry.SectionELength\
+                ))
+            except Exception as e:
+                Logger.error('Error parsing file_refs_entry (%s)'%str(e))
+                file_refs.append(None)
+        return file_refs
+    def _parse_volumes_info(self, buffer=None, header=None, file_info=None):
         '''
         Args:
-            original_position: Integer      => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO   => stream to read from
-            header: Container               => prefetch file header information parsed from stream
-            file_info: Container            => file information parsed from stream
-            file_metrics: Container         => file metrics array parsed from stream
+            buffer: memoryview         => buffer to read from
+            header: Header             => prefetch file header information parsed from buffer
+            file_info: FileInformation => file information parsed from buffer
+        Returns:
+            List<VolumeInformation>
+            Prefetch file volumes information (see src.structures.bulk.decode_volumes_info)
+        Preconditions:
+            buffer is of type memoryview         (assumed True)
+            header is of type Header             (assumed True)
+            file_info is of type FileInformation (assumed True)
+        '''
+        if header.Version == 'XP':
+            PrefetchVolumeInformation = pfbulk.PrefetchVolumeInformation17
+        elif header.Version == 'SEVEN':
+            PrefetchVolumeInformation = pfbulk.PrefetchVolumeInformation23
+        elif header.Version == 'EIGHT':
+            PrefetchVolumeInformation = pfbulk.PrefetchVolumeInformation26
+        else:
+            PrefetchVolumeInformation = pfbulk.PrefetchVolumeInformation30
+        return pfbulk.decode_volumes_info(\
+            buffer, 
+            file_info.SectionDOffset, 
+            file_info.SectionDEntriesCount, 
+            PrefetchVolumeInformation\
+        )
+    def _parse_filename_strings(self, buffer=None, header=None, file_info=None, file_metrics=None):
+        '''
+        Args:
+            buffer: memoryview                                  => buffer to read from
+            header: Header                                      => prefetch file header information parsed from buffer
+            file_info: FileInformation                          => file information parsed from buffer
+            file_metrics: List<FileMetricsEntry*>|numpy.ndarray => file metrics array parsed from buffer
         Returns:
             List<String>
             List of filename strings associated with file_metrics array
+            (see: src.structures.bulk.decode_filename_strings)
         Preconditions:
-            original_position is of type Integer        (assumed True)
-            stream is of type TextIOWrapper or BytesIO  (assumed True)
-            header is of type Container                 (assumed True)
-            file_info is of type Container              (assumed True)
-            file_metrics is of type Container           (assumed True)
-        '''
-        try:
-            stream.seek(file_info.SectionCOffset)
-            filename_strings = list()
-            for file_metric in file_metrics:
-                if (stream.tell() - file_info.SectionCOffset) <= file_info.SectionCLength:
-                    filename_strings.append(\
-                        pfstructs.PrefetchFileNameString.parse_stream(stream)\
-                    )
-                else:
-                    filename_strings.append(None)
-            return self._clean_transform(filename_strings)
-        finally:
-            stream.seek(original_position)
-    def _parse_trace_chains(self, original_position, stream=None, header=None, file_info=None):
+            buffer is of type memoryview                                    (assumed True)
+            header is of type Header                                        (assumed True)
+            file_info is of type FileInformation                            (assumed True)
+            file_metrics is of type List<FileMetricsEntry*> or numpy.ndarray (assumed True)
+        '''
+        if pfcolumnar.np is not None and isinstance(file_metrics, pfcolumnar.np.ndarray):
+            name_offsets = file_metrics['FileNameOffset'].tolist()
+            name_lengths = file_metrics['FileNameLength'].tolist()
+        else:
+            name_offsets = [file_metric.FileNameOffset for file_metric in file_metrics]
+            name_lengths = [file_metric.FileNameLength for file_metric in file_metrics]
+        return self._intern_strings(pfbulk.decode_filename_strings(\
+            buffer, 
+            file_info.SectionCOffset, 
+            file_info.SectionCLength, 
+            len(file_metrics), 
+            name_offsets, 
+            name_lengths\
+        ))
+    def _parse_trace_chains(self, buffer=None, header=None, file_info=None):
         '''
         Args:
-            original_position: Integer      => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO   => stream to read from
-            header: Container               => prefetch file header information parsed from stream
-            file_info: Container            => file information parsed from stream
+            buffer: memoryview         => buffer to read from
+            header: Header             => prefetch file header information parsed from buffer
+            file_info: FileInformation => file information parsed from buffer
         Returns:
-            List<Container<String, Any>>
-            Prefetch file trace chains information array (see: src.structures.prefetch.PrefetchTraceChainEntry)
+            List<TraceChainEntry>
+            Prefetch file trace chains information array (see: src.structures.bulk.decode_trace_chains)
         Preconditions:
-            original_position is of type Integer        (assumed True)
-            stream is of type TextIOWrapper or BytesIO  (assumed True)
-            header is of type Container                 (assumed True)
-            file_info is of type Container              (assumed True)
+            buffer is of type memoryview         (assumed True)
+            header is of type Header             (assumed True)
+            file_info is of type FileInformation (assumed True)
         '''
-        try:
-            stream.seek(file_info.SectionBOffset)
-            trace_chains = list()
-            for i in range(file_info.SectionBEntriesCount):
-                trace_chains.append(pfstructs.PrefetchTraceChainEntry.parse_stream(stream))
-            return self._clean_transform(trace_chains)
-        finally:
-            stream.seek(original_position)
-    def _parse_file_metrics(self, original_position, stream=None, header=None, file_info=None):
+        return pfbulk.decode_trace_chains(buffer, file_info.SectionBOffset, file_info.SectionBEntriesCount)
+    def _parse_trace_chains_columns(self, buffer=None, header=None, file_info=None):
+        '''
+        @Prefetch._parse_trace_chains
+        Returns:
+            numpy.ndarray
+            Prefetch file trace chains information array (see: src.structures.columnar.decode_trace_chains)
+        '''
+        return pfcolumnar.decode_trace_chains(buffer, file_info.SectionBOffset, file_info.SectionBEntriesCount)
+    def _parse_file_metrics(self, buffer=None, header=None, file_info=None):
         '''
         Args:
-            original_position: Integer      => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO   => stream to read from
-            header: Container               => prefetch file header information parsed from stream
-            file_info: Container            => file information parsed from stream
+            buffer: memoryview         => buffer to read from
+            header: Header             => prefetch file header information parsed from buffer
+            file_info: FileInformation => file information parsed from buffer
         Returns:
-            List<Container<String, Any>>
-            Prefetch file metrics information array (see: src.structures.prefetch.PrefetchFileMetrics*)
+            List<FileMetricsEntry*>
+            Prefetch file metrics information array (see: src.structures.bulk.decode_file_metrics*)
         Preconditions:
-            original_position is of type Integer        (assumed True)
-            stream is of type TextIOWrapper or BytesIO  (assumed True)
-            header is of type Container                 (assumed True)
-            file_info is of type Container              (assumed True)
+            buffer is of type memoryview         (assumed True)
+            header is of type Header             (assumed True)
+            file_info is of type FileInformation (assumed True)
         '''
-        try:
-            stream.seek(file_info.SectionAOffset)
-            if header.Version == 'XP':
-                PrefetchFileMetricsEntry = pfstructs.PrefetchFileMetricsEntry17
-            elif header.Version == 'SEVEN':
-                PrefetchFileMetricsEntry = pfstructs.PrefetchFileMetricsEntry23
-            elif header.Version == 'EIGHT':
-                PrefetchFileMetricsEntry = pfstructs.PrefetchFileMetricsEntry26
-            else:
-                PrefetchFileMetricsEntry = pfstructs.PrefetchFileMetricsEntry30
-            file_metrics = list()
-            for i in range(file_info.SectionAEntriesCount):
-                file_metrics_entry = self._clean_transform(PrefetchFileMetricsEntry.parse_stream(stream))
-                if hasattr(file_metrics_entry, 'FileReference'):
-                    file_metrics_entry.FileReference = self._clean_transform(file_metrics_entry.FileReference)
-                file_metrics.append(file_metrics_entry)
-            return self._clean_transform(file_metrics)
-        finally:
-            stream.seek(original_position)
-    def _parse_file_info(self, original_position, stream=None, header=None):
+        if header.Version == 'XP':
+            decode_file_metrics = pfbulk.decode_file_metrics17
+        elif header.Version == 'SEVEN':
+            decode_file_metrics = pfbulk.decode_file_metrics23
+        elif header.Version == 'EIGHT':
+            decode_file_metrics = pfbulk.decode_file_metrics26
+        else:
+            decode_file_metrics = pfbulk.decode_file_metrics30
+        return decode_file_metrics(buffer, file_info.SectionAOffset, file_info.SectionAEntriesCount)
+    def _parse_file_metrics_columns(self, buffer=None, header=None, file_info=None):
+        '''
+        @Prefetch._parse_file_metrics
+        Returns:
+            numpy.ndarray
+            Prefetch file metrics information array (see: src.structures.columnar.decode_file_metrics*)
+        '''
+        if header.Version == 'XP':
+            decode_file_metrics = pfcolumnar.decode_file_metrics17
+        elif header.Version == 'SEVEN':
+            decode_file_metrics = pfcolumnar.decode_file_metrics23
+        elif header.Version == 'EIGHT':
+            decode_file_metrics = pfcolumnar.decode_file_metrics26
+        else:
+            decode_file_metrics = pfcolumnar.decode_file_metrics30
+        return decode_file_metrics(buffer, file_info.SectionAOffset, file_info.SectionAEntriesCount)
+    def _parse_file_info(self, buffer=None, header=None):
         '''
         Args:
-            original_position: Integer      => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO   => stream to read from
-            header: Container               => prefetch file header information parsed from stream
+            buffer: memoryview => buffer to read from
+            header: Header     => prefetch file header information parsed from buffer
         Returns:
-            Container<String, Any>
-            Prefetch file information (see src.structures.prefetch.PrefetchFileInformation*)
+            FileInformation
+            Prefetch file information (see src.structures.bulk.decode_file_info)
         Preconditions:
-            original_position is of type Integer        (assumed True)
-            stream is of type TextIOWrapper or BytesIO  (assumed True)
-            header is of type Container                 (assumed True)
+            buffer is of type memoryview (assumed True)
+            header is of type Header     (assumed True)
         '''
         if header.Version == 'XP':
-            PrefetchFileInformation = pfstructs.PrefetchFileInformation17
+            PrefetchFileInformation = pfbulk.PrefetchFileInformation17
         elif header.Version == 'SEVEN':
-            PrefetchFileInformation = pfstructs.PrefetchFileInformation23
+            PrefetchFileInformation = pfbulk.PrefetchFileInformation23
         elif header.Version == 'EIGHT':
-            PrefetchFileInformation = pfstructs.PrefetchFileInformation26
+            PrefetchFileInformation = pfbulk.PrefetchFileInformation26
         else:
-            PrefetchFileInformation = pfstructs.PrefetchFileInformation30
-        file_info =  PrefetchFileInformation.parse_stream(stream)
-        file_info.LastExecutionTime = list(map(lambda ft: WindowsTime(ft).parse(), file_info.RawLastExecutionTime))
-        return self._clean_transform(file_info)
-    def _parse_header(self, original_position, stream=None):
+            PrefetchFileInformation = pfbulk.PrefetchFileInformation30
+        return pfbulk.decode_file_info(buffer, pfbulk.PrefetchHeader.size, PrefetchFileInformation)
+    def _parse_header(self, buffer=None):
         '''
         Args:
-            original_position: Integer      => position in stream before parsing this structure
-            stream: TextIOWrapper|BytesIO   => stream to read from
+            buffer: memoryview => buffer to read from
         Returns:
-            Container<String, Any>
-            Prefetch file header information (see src.structures.prefetch.PrefetchHeader)
+            Header
+            Prefetch file header information (see src.structures.bulk.decode_header)
         Preconditions:
-            original_position is of type Integer        (assumed True)
-            stream is of type TextIOWrapper or BytesIO  (assumed True)
+            buffer is of type memoryview (assumed True)
         '''
-        header = pfstructs.PrefetchHeader.parse_stream(stream)
-        header.Signature = header.RawSignature.decode('utf8')
-        header.ExecutableName = header.RawExecutableName.split('\x00')[0]
-        header.PrefetchHash = hex(header.RawPrefetchHash).replace('0x', '').upper()
-        return self._clean_transform(header)
-    def _hash_file(self, algorithm):
+        return pfbulk.decode_header(buffer)
+    def _hash_file(self, *algorithms):
         '''
         Args:
-            algorithm: String   => hash algorithm to use
+            algorithms: Tuple<String>   => hash algorithms to use
         Returns:
-            String
-            Hex digest of hash of prefetch file
+            List<String>
+            Hex digest of hash of prefetch file for each of algorithms 
+            (None for algorithms that are not available), computed in a single 
+            pass over the file contents.  Contents already in memory (see: Prefetch.from_bytes 
+            and Prefetch.get_buffer) are hashed directly, otherwise the file is read
+            in chunks of _HASH_READ_SIZE bytes
         Preconditions:
-            algorithm is of type String
+            algorithms is of type Tuple<String>
         '''
-        try:
-            hash = getattr(hashlib, algorithm)()
-        except Exception as e:
-            Logger.error('Unable to obtain %s hash of prefetch file (%s)'%(algorithm, str(e)))
-            return None
+        hashes = list()
+        for algorithm in algorithms:
+            try:
+                hashes.append(hashlib.new(algorithm))
+            except Exception as e:
+                Logger.error('Unable to obtain %s hash of prefetch file (%s)'%(algorithm, str(e)))
+                hashes.append(None)
+        active_hashes = [hash for hash in hashes if hash is not None]
+        if len(active_hashes) > 0:
+            data = self._data if self._data is not None else self.get('_raw_buffer')
+            if data is not None:
+                for hash in active_hashes:
+                    hash.update(data)
+            else:
+                with open(self._filepath, 'rb') as pf:
+                    buffer = pf.read(self._HASH_READ_SIZE)
+                    while len(buffer) > 0:
+                        for hash in active_hashes:
+                            hash.update(buffer)
+                        buffer = pf.read(self._HASH_READ_SIZE)
+        return [hash.hexdigest() if hash is not None else None for hash in hashes]
+    def _get_digests(self, simple_hash, cache=None, stat_result=None):
+        '''
+        Args:
+            simple_hash: Boolean            => whether to only collect SHA256 hash or 
+                                               MD5 and SHA1 as well
+            cache: MetadataCache            => persistent cache to look digests up in and add them to
+            stat_result: os.stat_result     => result of stat call on self._filepath
+        Returns:
+            Tuple<String, String, String>
+            MD5, SHA1 and SHA256 digests of prefetch file (MD5 and SHA1 are None if simple_hash),
+            taken from cache if it has an entry for this file as it is now
+        Preconditions:
+            simple_hash is of type Boolean          (assumed True)
+            cache is of type MetadataCache          (assumed True)
+            stat_result is of type os.stat_result   (assumed True)
+        '''
+        if cache is not None:
+            try:
+                cached = cache.get(self._filepath, stat_result)
+            except Exception as e:
+                Logger.warning('Failed to look up %s in metadata cache (%s)'%(self._filepath, str(e)))
+                cached = None
+            if cached is not None and (simple_hash or cached[0] is not None):
+                return (None, None, cached[2]) if simple_hash else tuple(cached)
+        if simple_hash:
+            digests = (None, None) + tuple(self._hash_file('sha256'))
         else:
-            with open(self._filepath, 'rb') as pf:
-                buffer = pf.read(1024)
-                while len(buffer) > 0:
-                    hash.update(buffer)
-                    buffer = pf.read(1024)
-            return hash.hexdigest()
-    def get_metadata(self, simple_hash=True):
+            digests = tuple(self._hash_file('md5', 'sha1', 'sha256'))
+        if cache is not None and digests[2] is not None:
+            try:
+                cache.put(self._filepath, *digests, stat_result=stat_result)
+            except Exception as e:
+                Logger.warning('Failed to add %s to metadata cache (%s)'%(self._filepath, str(e)))
+        return digests
+    def get_metadata(self, simple_hash=True, cache=None):
         '''
         Args:
             simple_hash: Boolean    => whether to only collect SHA256 hash or 
                                        MD5 and SHA1 as well
+            cache: MetadataCache    => persistent cache of digests, keyed on file identity, 
+                                       to skip rehashing unchanged files (see: src.utils.cache)
         Returns:
             Container<String, Any>
             Container of metadata about this prefetch file:
@@ -406,37 +587,258 @@ class Prefetch(Container):
                 modify_time: last modification time of prefetch file on local system
                 access_time: last access time of prefetch file on local system
                 create_time: create time of prefetch file on local system
+            The result is cached on self, so hashes are only computed once per parser
         Preconditions:
             simple_hash is of type Boolean
+            cache is of type MetadataCache  (assumed True)
         '''
         assert isinstance(simple_hash, bool), 'Simple_hash is of type Boolean'
-        return Container(\
-            file_name=path.basename(self._filepath),
-            file_path=path.abspath(self._filepath),
-            file_size=path.getsize(self._filepath),
-            md5hash=self._hash_file('md5') if not simple_hash else None,
-            sha1hash=self._hash_file('sha1') if not simple_hash else None,
-            sha2hash=self._hash_file('sha256'),
-            modify_time=datetime.fromtimestamp(path.getmtime(self._filepath), tzlocal()).astimezone(tzutc()),
-            access_time=datetime.fromtimestamp(path.getatime(self._filepath), tzlocal()).astimezone(tzutc()),
-            create_time=datetime.fromtimestamp(path.getctime(self._filepath), tzlocal()).astimezone(tzutc())\
+        metadata = self.get('_metadata')
+        if metadata is not None and (simple_hash or metadata.md5hash is not None):
+            return metadata
+        if self._data is not None:
+            md5hash, sha1hash, sha2hash = self._get_digests(simple_hash)
+            source_metadata = self.get('_source_metadata') or dict()
+            metadata = Container(\
+                file_name=path.basename(self._filepath),
+                file_path=self._filepath,
+                file_size=len(self._data),
+                md5hash=md5hash,
+                sha1hash=sha1hash,
+                sha2hash=sha2hash,
+                modify_time=source_metadata.get('modify_time'),
+                access_time=source_metadata.get('access_time'),
+                create_time=source_metadata.get('create_time')\
+            )
+        else:
+            stat_result = stat(self._filepath)
+            md5hash, sha1hash, sha2hash = self._get_digests(simple_hash, cache, stat_result)
+            metadata = Container(\
+                file_name=path.basename(self._filepath),
+                file_path=path.abspath(self._filepath),
+                file_size=stat_result.st_size,
+                md5hash=md5hash,
+                sha1hash=sha1hash,
+                sha2hash=sha2hash,
+                modify_time=datetime.fromtimestamp(stat_result.st_mtime, tzlocal()).astimezone(tzutc()),
+                access_time=datetime.fromtimestamp(stat_result.st_atime, tzlocal()).astimezone(tzutc()),
+                create_time=datetime.fromtimestamp(stat_result.st_ctime, tzlocal()).astimezone(tzutc())\
+            )
+        self._metadata = metadata
+        return metadata
+    def _get_extent(self, buffer, sections):
+        '''
+        Args:
+            buffer: memoryview          => buffer containing (at least) prefetch file header and file information
+            sections: Iterable<String>  => names of sections to parse
+        Returns:
+            Integer
+            Number of bytes from the start of the (decompressed) prefetch file needed to parse
+            sections, or None if it cannot be determined (i.e. if the file information is invalid 
+            or sections A (file metrics), B (trace chains), C (filename strings) and D (volumes information) 
+            are not laid out in that order, as each section is assumed to end where the next begins)
+        Preconditions:
+            buffer is of type memoryview        (assumed True)
+            sections is of type Iterable<String>  (assumed True)
+        '''
+        try:
+            file_info = self._parse_file_info(buffer, self._parse_header(buffer))
+        except Exception:
+            return None
+        offsets = [\
+            file_info.SectionAOffset, 
+            file_info.SectionBOffset, 
+            file_info.SectionCOffset, 
+            file_info.SectionDOffset\
+        ]
+        if offsets != sorted(offsets):
+            return None
+        extents = dict(\
+            header=len(buffer),
+            file_info=len(buffer),
+            file_metrics=file_info.SectionBOffset,
+            trace_chains=file_info.SectionCOffset,
+            filename_strings=file_info.SectionCOffset + file_info.SectionCLength\
         )
-    def get_stream(self, persist=False):
+        return max(\
+            extents.get(section, file_info.SectionDOffset + file_info.SectionDLength) \
+            for section in sections\
+        )
+    def _decompress_sections(self, raw_buffer, sections):
+        '''
+        Args:
+            raw_buffer: memoryview      => raw contents of MAM-compressed prefetch file
+            sections: Iterable<String>  => names of sections to parse
+        Returns:
+            ByteArray
+            Decompressed contents of prefetch file, up to (at least) the end of the last of sections.
+            Blocks are decompressed one at a time (see: src.parsers.xpress.iter_decompress_mam), and
+            once the header and file information are available (i.e. after the first block) the extent 
+            of sections is determined (see: Prefetch._get_extent) so decompression can stop 
+            as soon as it is reached, which for the header and file information alone means
+            only decompressing the first block
+        Preconditions:
+            raw_buffer is of type memoryview        (assumed True)
+            sections is of type Iterable<String>    (assumed True)
+        '''
+        blocks = DecompressWin10().iter_decompress_buffer(raw_buffer)
+        try:
+            payload = bytearray(next(blocks, bytes()))
+            extent = self._get_extent(memoryview(bytes(payload)), sections)
+            while extent is None or len(payload) < extent:
+                block = next(blocks, None)
+                if block is None:
+                    break
+                payload += block
+        finally:
+            blocks.close()
+        return payload
+    def _decompress(self, raw_buffer, sections=None):
         '''
         Args:
-            persist: Boolean    => whether to persist stream as attribute on self
+            raw_buffer: memoryview      => raw contents of MAM-compressed prefetch file
+            sections: Iterable<String>  => names of sections to parse, if only those need to be decompressed
         Returns:
-            TextIOWrapper|BytesIO
-            Stream of prefetch file at self._filepath
+            ByteArray
+            Decompressed contents of prefetch file, read from self._payload_cache
+            if it has an entry for raw_buffer (and added to it otherwise).  If sections 
+            is supplied and payload caching is disabled, only the part of the file 
+            needed to parse sections is decompressed (see: Prefetch._decompress_sections), 
+            as a partial payload cannot be cached
         Preconditions:
-            persist is of type Boolean  (assumed True)
+            raw_buffer is of type memoryview        (assumed True)
+            sections is of type Iterable<String>    (assumed True)
+        '''
+        payload_cache = self.get('_payload_cache')
+        if payload_cache is None:
+            if sections is not None:
+                return self._decompress_sections(raw_buffer, sections)
+            return DecompressWin10().decompress_buffer(raw_buffer)
+        digest = hashlib.sha256(raw_buffer).hexdigest()
+        payload = payload_cache.get(digest)
+        if payload is None:
+            payload = DecompressWin10().decompress_buffer(raw_buffer)
+            try:
+                payload_cache.put(digest, payload)
+            except Exception as e:
+                Logger.warning('Failed to add %s to payload cache (%s)'%(self._filepath, str(e)))
+        return payload
+    def _get_raw_buffer(self):
         '''
-        stream = open(self._filepath, 'rb') \
-            if self._get_version() is not None \
-            else BytesIO(DecompressWin10().decompress(self._filepath))
+        Args:
+            N/A
+        Returns:
+            memoryview
+            Raw (possibly compressed) contents of prefetch file (see: Prefetch.from_bytes)
+            or of file at self._filepath, read from disk in a single call, or (if self._use_mmap) 
+            a read-only memory map of the file
+        Preconditions:
+            N/A
+        '''
+        if self._data is not None:
+            return memoryview(self._data)
+        with open(self._filepath, 'rb') as pf:
+            if self._use_mmap and fstat(pf.fileno()).st_size > 0:
+                try:
+                    return memoryview(mmap.mmap(pf.fileno(), 0, access=mmap.ACCESS_READ))
+                except (ValueError, OSError) as e:
+                    Logger.warning('Failed to memory map %s, falling back to read (%s)'%(self._filepath, str(e)))
+            return memoryview(pf.read())
+    def iter_buffer(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Generator<ByteString|memoryview>
+            (Decompressed) contents of prefetch file in blocks, which for MAM-compressed files
+            are yielded as they are decompressed (see: src.parsers.xpress.iter_decompress_mam),
+            so the whole decompressed file need not be held in memory at once.  If self._payload
+            was supplied, or the payload cache has an entry for the file, it is yielded as a single block
+        Preconditions:
+            N/A
+        '''
+        if self.get('_payload') is not None:
+            yield memoryview(self._payload)
+            return
+        raw_buffer = self._get_raw_buffer()
+        if not self._is_compressed(raw_buffer):
+            yield raw_buffer
+        elif self.get('_payload_cache') is not None:
+            yield memoryview(self._decompress(raw_buffer))
+        else:
+            yield from DecompressWin10().iter_decompress_buffer(raw_buffer)
+    def get_buffer(self, persist=False, sections=None):
+        '''
+        Args:
+            persist: Boolean            => whether to persist buffer as attribute on self
+            sections: Iterable<String>  => names of sections that will be parsed from buffer (default: all)
+        Returns:
+            memoryview
+            Buffer containing (decompressed) contents of prefetch file (see: Prefetch.from_bytes)
+            or of file at self._filepath, read from disk in a single call, or (if self._use_mmap) a read-only memory map 
+            of the file.  Decompressed contents are wrapped without being copied, and if 
+            self._payload was supplied (i.e. by a separate decompression stage) it is used as is.
+            If sections is supplied, compressed contents may only be decompressed up to the end
+            of the last of sections (see: Prefetch._decompress)
+        Preconditions:
+            persist is of type Boolean              (assumed True)
+            sections is of type Iterable<String>    (assumed True)
+        '''
+        if self.get('_payload') is not None:
+            buffer = memoryview(self._payload)
+            if persist:
+                self._buffer = buffer
+            return buffer
+        raw_buffer = self._get_raw_buffer()
+        if self._is_compressed(raw_buffer):
+            buffer = memoryview(self._decompress(raw_buffer, sections))
+        else:
+            buffer = raw_buffer
         if persist:
-            self._stream = stream
-        return stream
+            self._buffer = buffer
+            self._raw_buffer = raw_buffer
+        return buffer
+    def _release_buffer(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Release the buffer (and raw file contents or supplied payload) persisted by Prefetch.get_buffer
+        Preconditions:
+            N/A
+        '''
+        self._buffer = None
+        self._raw_buffer = None
+        self._payload = None
+    def _release_source(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Release the buffer (see: Prefetch._release_buffer) and everything else needed only
+            to read the prefetch file (raw contents supplied to Prefetch.from_bytes, supplied
+            payload, payload cache and memory map setting), so that only the parsed sections 
+            and metadata remain, i.e. when the parser is sent to another process.  The file
+            cannot be read or parsed again afterwards
+        Preconditions:
+            All sections have been parsed                               (assumed True)
+            Metadata has been collected (see: Prefetch.get_metadata)    (assumed True)
+        '''
+        self._release_buffer()
+        for key in ('_data', '_payload', '_payload_cache', '_use_mmap'):
+            if key in self:
+                del self[key]
+    def get_stream(self, persist=False):
+        '''
+        Args:
+            @Prefetch.get_buffer
+        Returns:
+            BytesIO
+            Stream over (decompressed) contents of prefetch file at self._filepath
+        Preconditions:
+            @Prefetch.get_buffer
+        '''
+        return BytesIO(self.get_buffer(persist))
     def serialize(self):
         '''
         Args:
@@ -447,60 +849,97 @@ class Prefetch(Container):
         Preconditions:
             N/A
         '''
-        return self._clean_transform(self, serialize=True)
-    def parse_structure(self, structure, *args, stream=None, **kwargs):
+        self.parse_remaining()
+        return Container(\
+            (section, self._serialize_value(dict.__getitem__(self, section))) \
+            for section in self._SECTION_ORDER if dict.__contains__(self, section)\
+        )
+    def parse_remaining(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Parse any sections still pending from a lazy parse and
+            release the persisted buffer
+        Preconditions:
+            N/A
+        '''
+        pending = dict.get(self, '_pending')
+        if pending is not None:
+            for attribute in list(pending.keys()):
+                getattr(self, attribute)
+    def parse_structure(self, structure, *args, buffer=None, **kwargs):
         '''
         Args:
-            structure: String               => structure to parse
-            stream: TextIOWrapper|BytesIO   => stream to parse structure from
+            structure: String   => structure to parse
+            buffer: memoryview  => buffer to parse structure from
         Returns:
             Container
             Parsed structure if parsed successfully, None otherwise
         Preconditions:
             structure is of type String
-            stream is of type TextIOWrapper|BytesIO (assumed True)
+            buffer is of type memoryview    (assumed True)
         '''
         assert isinstance(structure, str), 'Structure is not of type String'
-        if stream is None:
-            stream = self._stream
+        if buffer is None:
+            buffer = self._buffer
         structure_parser = getattr(self, '_parse_' + structure, None)
         if structure_parser is None:
             Logger.error('Structure %s is not a known structure'%structure)
             return None
+        prepared_kwargs = dict()
+        for dependency in self._STRUCTURE_DEPENDENCIES.get(structure, ()):
+            prepared_kwargs[dependency] = kwargs.get(dependency)
+            if prepared_kwargs[dependency] is None:
+                prepared_kwargs[dependency] = getattr(self, dependency, None)
+            if prepared_kwargs[dependency] is None:
+                Logger.error('Failed to parse %s structure (dependency %s was not provided and has not been parsed)'%(structure, dependency))
+                return None
         try:
-            prepared_kwargs = self._prepare_kwargs(structure_parser, **kwargs)
-        except Exception as e:
-            Logger.error('Failed to parse provided kwargs for structure %s (%s)'%(structure, str(e)))
-            return None
-        original_position = stream.tell()
-        try:
-            return structure_parser(original_position, *args, stream=stream, **prepared_kwargs)
+            return structure_parser(*args, buffer=buffer, **prepared_kwargs)
         except Exception as e:
             Logger.error('Failed to parse %s structure (%s)'%(structure, str(e)))
             return None
-    def parse(self):
+    def parse(self, sections=None, columnar=False, lazy=False):
         '''
         Args:
-            N/A
+            sections: Iterable<String>  => names of sections to parse (see: Prefetch.SECTIONS),
+                                           sections they depend on are parsed as well (default: all)
+            columnar: Boolean           => whether to decode file metrics and trace chains
+                                           into NumPy structured arrays (see: src.structures.columnar)
+                                           instead of lists of records
+            lazy: Boolean               => whether to defer parsing each section until it
+                                           is first accessed
         Procedure:
             Attempt to parse the supplied prefetch file, extracting
             header, file information, file metrics, trace chains,
-            filename strings, and volumes information
+            filename strings, and volumes information.  Only the requested
+            sections and their dependencies are parsed, and sections that are
+            not parsed are absent from self.  If lazy is True,
+            the file is read into memory but each section is only parsed 
+            (and then cached) when its attribute is first accessed, and
+            the buffer is released once every section has been parsed
+            (see: Prefetch.parse_remaining)
         Preconditions:
             self._filepath points to valid prefetch file    (assumed True)
-        '''
-        self.get_stream(True)
+            sections is of type Iterable<String>            (assumed True)
+            columnar is of type Boolean                     (assumed True)
+            lazy is of type Boolean                         (assumed True)
+        '''
+        if columnar and pfcolumnar.np is None:
+            Logger.warning('NumPy is not installed, falling back to record-based parsing')
+            columnar = False
+        structures = Container(\
+            (section, self._COLUMNAR_SECTIONS.get(section, section) if columnar else section) \
+            for section in self._resolve_sections(sections)\
+        )
+        self.get_buffer(True, structures.keys())
+        if lazy:
+            self._pending = structures
+            return self
         try:
-            self.header = self.parse_structure('header')
-            self.file_info = self.parse_structure('file_info')
-            self.file_metrics = self.parse_structure('file_metrics')
-            self.filename_strings = self.parse_structure('filename_strings')
-            self.trace_chains = self.parse_structure('trace_chains')
-            self.volumes_info = self.parse_structure('volumes_info')
-            self.file_references = self.parse_structure('file_references')
-            self.directory_strings = self.parse_structure('directory_strings')
+            for section, structure in structures.items():
+                self[section] = self.parse_structure(structure)
             return self
         finally:
-            if self._stream is not None:
-                self._stream.close()
-                self._stream = None
+            self._release_buffer()
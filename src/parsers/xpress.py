@@ -0,0 +1,311 @@
+## -*- coding: UTF-8 -*-
+## xpress.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from struct import Struct
+from binascii import crc32
+
+'''
+Portable decoder for the XPRESS Huffman (LZ77 + Huffman) compression format
+([MS-XCA] section 2.2) used by Win10 MAM-compressed prefetch files, for systems
+where ntdll!RtlDecompressBufferEx is not available.  Input is split into blocks of
+(at least) 65536 bytes of output, each preceded by the 4-bit code lengths of its
+512 symbols, from which a lookup table indexed by the next 15 bits of input
+is built so each symbol is decoded with a single table lookup.
+'''
+
+'''
+MAM header: signature (MAM and compression format/CRC flag) and decompressed size
+'''
+MAMHeader = Struct('<4sI')
+
+'''
+CRC32 of MAM-compressed file, present if the high nibble of the last signature byte is set
+'''
+MAMChecksum = Struct('<I')
+
+MAM_SIGNATURE = b'MAM'
+COMPRESSION_FORMAT_XPRESS_HUFF = 4
+
+_BLOCK_SIZE = 65536
+_TABLE_BITS = 15
+_SYMBOL_COUNT = 512
+## Upper bound on the input consumed by a single block: its code length table and
+## initial bits, at most 16 bits per output byte (i.e. literals with 15-bit codes)
+## and the extra length bytes and offset bits of a match crossing the block end
+_MAX_BLOCK_INPUT = 256 + 4 + 2 * _BLOCK_SIZE + 16
+
+def _build_decoding_table(lengths):
+    '''
+    Args:
+        lengths: ByteString => 256 bytes of packed 4-bit symbol code lengths
+    Returns:
+        List<Integer>
+        Decoding table with an entry for every 15-bit input prefix,
+        holding (symbol << 4) | code length of the symbol the prefix starts with
+    Preconditions:
+        lengths is of type ByteString of length 256 (assumed True)
+    '''
+    symbols_by_length = [list() for _ in range(_TABLE_BITS + 1)]
+    for index, packed in enumerate(lengths):
+        symbols_by_length[packed & 0x0F].append(index << 1)
+        symbols_by_length[packed >> 4].append((index << 1) | 1)
+    table = list()
+    for length in range(1, _TABLE_BITS + 1):
+        entry_count = 1 << (_TABLE_BITS - length)
+        for symbol in symbols_by_length[length]:
+            table.extend([(symbol << 4) | length] * entry_count)
+    if len(table) != 1 << _TABLE_BITS:
+        raise ValueError('Invalid Huffman code lengths in XPRESS Huffman block')
+    return table
+
+class _BufferStream(object):
+    '''
+    Minimal read-only stream over a buffer (i.e. a memory map of a compressed file), 
+    used instead of BytesIO so that the buffer is not copied into memory
+    '''
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer)
+        self._position = 0
+    def read(self, size=-1):
+        '''
+        Args:
+            size: Integer   => maximum number of bytes to read (all remaining if negative)
+        Returns:
+            ByteString
+            Next (at most) size bytes of buffer
+        Preconditions:
+            size is of type Integer (assumed True)
+        '''
+        end = len(self._buffer) if size < 0 else min(self._position + size, len(self._buffer))
+        data = bytes(self._buffer[self._position:end])
+        self._position = end
+        return data
+
+def iter_decompress_huffman(stream, decompressed_size):
+    '''
+    Args:
+        stream: File-like object    => stream of XPRESS Huffman compressed data
+        decompressed_size: Integer  => size of decompressed data
+    Returns:
+        Generator<ByteString>
+        Decompressed data, one block (of 65536 bytes, except for the last block
+        and blocks following a match that crossed a block boundary) at a time.  Only 
+        the input needed to decode the next block and the last _BLOCK_SIZE bytes of 
+        output (the largest offset a match can refer back to) are kept in memory
+    Preconditions:
+        stream is a file-like object opened in binary mode  (assumed True)
+        decompressed_size is of type Integer >= 0           (assumed True)
+    '''
+    data = bytes()
+    exhausted = False
+    input_end = 0
+    output = bytearray()
+    append = output.append
+    output_position = 0
+    remaining = decompressed_size
+    position = 0
+    while remaining > 0:
+        if not exhausted and len(data) - position < _MAX_BLOCK_INPUT:
+            chunks = [data[position:]]
+            available = len(chunks[0])
+            while available < _MAX_BLOCK_INPUT:
+                chunk = stream.read(_MAX_BLOCK_INPUT)
+                if not chunk:
+                    exhausted = True
+                    break
+                chunks.append(chunk)
+                available += len(chunk)
+            data = bytes().join(chunks)
+            position = 0
+            input_end = len(data)
+            if exhausted:
+                ## Pad input so that reading past its end (i.e. refilling the bit buffer 
+                ## after the final symbol) reads zeros rather than raising IndexError
+                data += bytes(8)
+        if position + 256 > input_end:
+            raise ValueError('XPRESS Huffman data ends before decompressed size reached')
+        table = _build_decoding_table(data[position:position + 256])
+        position += 256
+        next_bits = (data[position] << 16) | (data[position + 1] << 24) | data[position + 2] | (data[position + 3] << 8)
+        position += 4
+        extra_bit_count = 16
+        block_start = output_position
+        block_end = output_position + min(_BLOCK_SIZE, remaining)
+        while output_position < block_end:
+            entry = table[next_bits >> 17]
+            length = entry & 0x0F
+            next_bits = (next_bits << length) & 0xFFFFFFFF
+            extra_bit_count -= length
+            if extra_bit_count < 0:
+                next_bits |= (data[position] | (data[position + 1] << 8)) << -extra_bit_count
+                position += 2
+                extra_bit_count += 16
+            symbol = entry >> 4
+            if symbol < 256:
+                append(symbol)
+                output_position += 1
+                continue
+            match_length = symbol & 0x0F
+            offset_bit_count = (symbol >> 4) & 0x0F
+            if match_length == 15:
+                match_length = data[position]
+                position += 1
+                if match_length == 255:
+                    match_length = data[position] | (data[position + 1] << 8)
+                    position += 2
+                    if match_length == 0:
+                        match_length = data[position] | (data[position + 1] << 8) | (data[position + 2] << 16) | (data[position + 3] << 24)
+                        position += 4
+                    if match_length < 15:
+                        raise ValueError('Invalid match length in XPRESS Huffman data')
+                    match_length -= 15
+                match_length += 15
+            match_length += 3
+            if offset_bit_count > 0:
+                match_offset = (next_bits >> (32 - offset_bit_count)) | (1 << offset_bit_count)
+                next_bits = (next_bits << offset_bit_count) & 0xFFFFFFFF
+                extra_bit_count -= offset_bit_count
+                if extra_bit_count < 0:
+                    next_bits |= (data[position] | (data[position + 1] << 8)) << -extra_bit_count
+                    position += 2
+                    extra_bit_count += 16
+            else:
+                match_offset = 1
+            start = output_position - match_offset
+            if start < 0:
+                raise ValueError('Invalid match offset in XPRESS Huffman data')
+            if output_position + match_length > block_start + remaining:
+                raise ValueError('Invalid match length in XPRESS Huffman data (match exceeds decompressed size)')
+            if match_offset >= match_length:
+                output += output[start:start + match_length]
+            else:
+                pattern = output[start:]
+                output += (pattern * -(-match_length // match_offset))[:match_length]
+            output_position += match_length
+        if exhausted and position > input_end + 4:
+            raise ValueError('XPRESS Huffman data ends before decompressed size reached')
+        block = bytes(output[block_start:block_start + remaining])
+        remaining -= len(block)
+        yield block
+        if output_position > _BLOCK_SIZE:
+            del output[:output_position - _BLOCK_SIZE]
+            output_position = _BLOCK_SIZE
+
+def decompress_huffman(buffer, decompressed_size):
+    '''
+    Args:
+        buffer: ByteString|memoryview   => XPRESS Huffman compressed data
+        decompressed_size: Integer      => size of decompressed data
+    Returns:
+        ByteArray
+        Decompressed data (see: iter_decompress_huffman)
+    Preconditions:
+        buffer is of type ByteString or memoryview  (assumed True)
+        decompressed_size is of type Integer >= 0   (assumed True)
+    '''
+    output = bytearray()
+    for block in iter_decompress_huffman(_BufferStream(buffer), decompressed_size):
+        output += block
+    return output
+
+def decompress_mam(buffer):
+    '''
+    Args:
+        buffer: ByteString|memoryview   => contents of MAM-compressed prefetch file
+    Returns:
+        ByteArray
+        Decompressed prefetch file
+    Preconditions:
+        buffer is of type ByteString or memoryview  (assumed True)
+    '''
+    signature, decompressed_size = MAMHeader.unpack_from(buffer, 0)
+    if signature[:3] != MAM_SIGNATURE:
+        raise ValueError('Invalid MAM signature %r'%signature)
+    compression_format = signature[3] & 0x0F
+    if compression_format != COMPRESSION_FORMAT_XPRESS_HUFF:
+        raise ValueError('Unsupported MAM compression format %d'%compression_format)
+    offset = MAMHeader.size
+    if signature[3] & 0xF0:
+        stored_crc, = MAMChecksum.unpack_from(buffer, offset)
+        offset += MAMChecksum.size
+        crc = crc32(bytes(buffer[offset:]), crc32(bytes(4), crc32(bytes(buffer[:MAMHeader.size]))))
+        if crc != stored_crc:
+            raise ValueError('MAM CRC mismatch (expected 0x%08x, computed 0x%08x)'%(stored_crc, crc))
+    return decompress_huffman(buffer[offset:], decompressed_size)
+
+class _ChecksumStream(object):
+    '''
+    Stream wrapper that computes the CRC32 of the data read through it
+    '''
+    def __init__(self, stream, crc):
+        self._stream = stream
+        self.crc = crc
+    def read(self, size=-1):
+        '''
+        Args:
+            @_BufferStream.read
+        Returns:
+            @_BufferStream.read
+        Preconditions:
+            @_BufferStream.read
+        '''
+        data = self._stream.read(size)
+        self.crc = crc32(data, self.crc)
+        return data
+
+def iter_decompress_mam(stream):
+    '''
+    Args:
+        stream: File-like object|ByteString|memoryview  => stream (or buffer) of MAM-compressed prefetch file contents
+    Returns:
+        Generator<ByteString>
+        Decompressed prefetch file, one block at a time (see: iter_decompress_huffman).
+        If the file has a CRC32 it is verified once the last block has been decompressed
+        (and the rest of stream read), so it is not verified if the generator is closed early
+    Preconditions:
+        stream is a file-like object opened in binary mode, ByteString or memoryview    (assumed True)
+    '''
+    if not hasattr(stream, 'read'):
+        stream = _BufferStream(stream)
+    header = stream.read(MAMHeader.size)
+    if len(header) < MAMHeader.size:
+        raise ValueError('MAM header is truncated')
+    signature, decompressed_size = MAMHeader.unpack(header)
+    if signature[:3] != MAM_SIGNATURE:
+        raise ValueError('Invalid MAM signature %r'%signature)
+    compression_format = signature[3] & 0x0F
+    if compression_format != COMPRESSION_FORMAT_XPRESS_HUFF:
+        raise ValueError('Unsupported MAM compression format %d'%compression_format)
+    if not signature[3] & 0xF0:
+        yield from iter_decompress_huffman(stream, decompressed_size)
+        return
+    checksum = stream.read(MAMChecksum.size)
+    if len(checksum) < MAMChecksum.size:
+        raise ValueError('MAM header is truncated')
+    stored_crc, = MAMChecksum.unpack(checksum)
+    checksum_stream = _ChecksumStream(stream, crc32(bytes(4), crc32(header)))
+    yield from iter_decompress_huffman(checksum_stream, decompressed_size)
+    while checksum_stream.read(_MAX_BLOCK_INPUT):
+        pass
+    if checksum_stream.crc != stored_crc:
+        raise ValueError('MAM CRC mismatch (expected 0x%08x, computed 0x%08x)'%(stored_crc, checksum_stream.crc))
@@ -0,0 +1,344 @@
+## -*- coding: UTF-8 -*-
+## bulk.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from struct import Struct
+
+from src.utils.time import filetimes_to_epoch_us, filetime_to_epoch_us
+from .prefetch import PrefetchVersion
+from .records import \
+    Header, \
+    FileInformation, \
+    VolumeInformation, \
+    FileReferences, \
+    TraceChainEntry, \
+    FileMetricsEntry17, \
+    FileMetricsEntry23, \
+    FileReference
+
+'''
+Precompiled struct layouts of the fixed-size record arrays in prefetch files.
+Each layout mirrors the construct definition of the same name in
+src.structures.prefetch, with padding expressed as pad bytes (x) so
+that unpacking yields exactly the named fields of that definition.
+'''
+
+'''
+@src.structures.general.NTFSFileReference
+'''
+NTFSFileReference = Struct('<I2xH')
+
+'''
+@src.structures.prefetch.PrefetchHeader
+'''
+PrefetchHeader = Struct('<I4s4xI60sI4x')
+
+'''
+@src.structures.prefetch.PrefetchTraceChainEntry
+'''
+PrefetchTraceChainEntry = Struct('<IIxBxx')
+
+'''
+@src.structures.prefetch.PrefetchFileReferences
+    References are unpacked separately (see: NTFSFileReference)
+'''
+PrefetchFileReferences = Struct('<4xI')
+
+'''
+@src.structures.prefetch.PrefetchFileInformation17
+    RawLastExecutionTime is unpacked as 64-bit integers
+    (see: src.structures.general.NTFSFILETIME)
+'''
+PrefetchFileInformation17 = Struct('<9IQ16xI4x')
+
+'''
+@src.structures.prefetch.PrefetchVolumeInformation17
+    RawVolumeCreateTime is unpacked as a 64-bit integer
+    (see: src.structures.general.NTFSFILETIME)
+'''
+PrefetchVolumeInformation17 = Struct('<IIQ5I4x')
+
+'''
+@src.structures.prefetch.PrefetchFileMetricsEntry17
+'''
+PrefetchFileMetricsEntry17 = Struct('<IIII4x')
+
+'''
+@src.structures.prefetch.PrefetchFileMetricsEntry23
+    FileReference is unpacked inline (see: src.structures.general.NTFSFileReference)
+'''
+PrefetchFileMetricsEntry23 = Struct('<IIIII4xI2xH')
+
+'''
+@PrefetchFileInformation17
+'''
+PrefetchFileInformation23 = Struct('<9I8xQ16xI84x')
+
+'''
+@PrefetchVolumeInformation17
+'''
+PrefetchVolumeInformation23 = Struct('<IIQ5I68x')
+
+'''
+@PrefetchFileInformation17
+'''
+PrefetchFileInformation26 = Struct('<9I8x8Q16xI96x')
+
+PrefetchFileMetricsEntry26 = PrefetchFileMetricsEntry23
+
+PrefetchVolumeInformation26 = PrefetchVolumeInformation23
+
+PrefetchFileInformation30 = PrefetchFileInformation26
+
+'''
+@PrefetchVolumeInformation17
+'''
+PrefetchVolumeInformation30 = Struct('<IIQ5I60x')
+
+PrefetchFileMetricsEntry30 = PrefetchFileMetricsEntry26
+
+def _section(buffer, offset, count, structure):
+    '''
+    Args:
+        buffer: memoryview  => buffer containing section
+        offset: Integer     => offset of section in buffer
+        count: Integer      => number of entries in section
+        structure: Struct   => layout of each entry in section
+    Returns:
+        memoryview
+        Slice of buffer containing exactly count entries
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+        structure is of type Struct     (assumed True)
+    '''
+    section = buffer[offset:offset + count * structure.size]
+    if len(section) != count * structure.size:
+        raise ValueError('Expected %d bytes at offset %d but found %d'%(count * structure.size, offset, len(section)))
+    return section
+
+def decode_header(buffer):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+    Returns:
+        Header
+        Prefetch file header decoded from start of buffer
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+    '''
+    version, signature, file_size, executable_name, prefetch_hash = \
+        PrefetchHeader.unpack(_section(buffer, 0, 1, PrefetchHeader))
+    if signature != b'SCCA':
+        raise ValueError('Expected signature %r but found %r'%(b'SCCA', signature))
+    executable_name = bytes(executable_name)
+    for i in range(0, len(executable_name), 2):
+        if executable_name[i:i + 2] == b'\x00\x00':
+            executable_name = executable_name[:i]
+            break
+    return Header(\
+        PrefetchVersion.decmapping.get(version, version),
+        signature.decode('utf8'),
+        file_size,
+        executable_name.decode('utf-16-le'),
+        hex(prefetch_hash).replace('0x', '').upper()\
+    )
+
+def decode_file_info(buffer, offset, structure):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of file information in buffer
+        structure: Struct   => layout of file information (see: PrefetchFileInformation*)
+    Returns:
+        FileInformation
+        Prefetch file information with last execution times converted to 
+        microseconds since the Unix epoch
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        structure is of type Struct     (assumed True)
+    '''
+    fields = structure.unpack(_section(buffer, offset, 1, structure))
+    return FileInformation(*fields[:9], filetimes_to_epoch_us(fields[9:-1]), fields[-1])
+
+def decode_volumes_info(buffer, offset, count, structure):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of volumes information array (Section D) in buffer
+        count: Integer      => number of volumes information entries
+        structure: Struct   => layout of each entry (see: PrefetchVolumeInformation*)
+    Returns:
+        List<VolumeInformation>
+        Volumes information array, with volume create times converted to microseconds
+        since the Unix epoch and volume device paths read from Section D
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+        structure is of type Struct     (assumed True)
+    '''
+    volumes_info = list()
+    for path_offset, path_length, create_time, serial_number, e_offset, e_length, f_offset, f_count \
+        in structure.iter_unpack(_section(buffer, offset, count, structure)):
+        device_path = bytes(buffer[offset + path_offset:offset + path_offset + path_length * 2]).replace(b'\x00', b'')
+        if len(device_path) < path_length:
+            raise ValueError('Expected %d bytes of volume device path but found %d'%(path_length, len(device_path)))
+        volumes_info.append(VolumeInformation(\
+            path_offset,
+            path_length,
+            filetime_to_epoch_us(create_time),
+            serial_number,
+            e_offset,
+            e_length,
+            f_offset,
+            f_count,
+            device_path[:path_length].decode('utf8')\
+        ))
+    return volumes_info
+
+def decode_file_references(buffer, offset, length):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of file references section (Section E) in buffer
+        length: Integer     => length of file references section in bytes
+    Returns:
+        FileReferences
+        File references section decoded in a single pass
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        length is of type Integer       (assumed True)
+    '''
+    section = buffer[offset:offset + length]
+    reference_count, = PrefetchFileReferences.unpack(_section(section, 0, 1, PrefetchFileReferences))
+    return FileReferences(\
+        reference_count,
+        [\
+            FileReference(*entry) \
+            for entry in NTFSFileReference.iter_unpack(\
+                _section(section, PrefetchFileReferences.size, reference_count, NTFSFileReference)\
+            )\
+        ]\
+    )
+
+def decode_filename_strings(buffer, offset, length, count, name_offsets=None, name_lengths=None):
+    '''
+    Args:
+        buffer: memoryview                  => buffer to read from
+        offset: Integer                     => offset of filename strings (Section C) in buffer
+        length: Integer                     => length of filename strings section in bytes
+        count: Integer                      => number of filename strings to decode
+        name_offsets: Iterable<Integer>     => FileNameOffset of each file metrics entry
+        name_lengths: Iterable<Integer>     => FileNameLength of each file metrics entry
+    Returns:
+        List<String>
+        Filename strings section decoded in a single pass.  The section is decoded
+        from UTF16 once, and each string is sliced out of the decoded text using
+        name_offsets and name_lengths if supplied and consistent with the section, 
+        or else by splitting the text on (aligned) NUL terminators.  Strings past
+        the end of the section are None
+    Preconditions:
+        buffer is of type memoryview                (assumed True)
+        offset is of type Integer                   (assumed True)
+        length is of type Integer                   (assumed True)
+        count is of type Integer                    (assumed True)
+        name_offsets is of type Iterable<Integer>   (assumed True)
+        name_lengths is of type Iterable<Integer>   (assumed True)
+    '''
+    section = bytes(buffer[offset:offset + length])
+    text = section[:len(section) - len(section) % 2].decode('utf-16-le')
+    if name_offsets is not None and name_lengths is not None and len(text) * 2 == len(section) - len(section) % 2:
+        filename_strings = list()
+        for name_offset, name_length in zip(name_offsets, name_lengths):
+            start = name_offset // 2
+            if name_offset % 2 != 0 or text[start + name_length:start + name_length + 1] != '\x00':
+                break
+            filename_strings.append(text[start:start + name_length])
+        else:
+            if len(filename_strings) == count:
+                return filename_strings
+    filename_strings = text.split('\x00')
+    remainder = filename_strings.pop()
+    if len(filename_strings) < count and len(remainder) > 0:
+        raise ValueError('Filename string at offset %d is not NUL-terminated'%(offset + 2 * (len(text) - len(remainder))))
+    if len(filename_strings) >= count:
+        return filename_strings[:count]
+    return filename_strings + [None] * (count - len(filename_strings))
+
+def decode_trace_chains(buffer, offset, count):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of trace chains array (Section B) in buffer
+        count: Integer      => number of trace chain entries
+    Returns:
+        List<TraceChainEntry>
+        Trace chains array decoded in a single pass
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+    '''
+    return [\
+        TraceChainEntry(*entry) \
+        for entry in PrefetchTraceChainEntry.iter_unpack(_section(buffer, offset, count, PrefetchTraceChainEntry))\
+    ]
+
+def decode_file_metrics17(buffer, offset, count):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of file metrics array (Section A) in buffer
+        count: Integer      => number of file metrics entries
+    Returns:
+        List<FileMetricsEntry17>
+        File metrics array decoded in a single pass
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+    '''
+    return [\
+        FileMetricsEntry17(*entry) \
+        for entry in PrefetchFileMetricsEntry17.iter_unpack(_section(buffer, offset, count, PrefetchFileMetricsEntry17))\
+    ]
+
+def decode_file_metrics23(buffer, offset, count):
+    '''
+    @decode_file_metrics17
+    Returns:
+        List<FileMetricsEntry23>
+        File metrics array decoded in a single pass
+    '''
+    return [\
+        FileMetricsEntry23(start, duration, average, name_offset, name_length, FileReference(segment, sequence)) \
+        for start, duration, average, name_offset, name_length, segment, sequence \
+        in PrefetchFileMetricsEntry23.iter_unpack(_section(buffer, offset, count, PrefetchFileMetricsEntry23))\
+    ]
+
+decode_file_metrics26 = decode_file_metrics23
+
+decode_file_metrics30 = decode_file_metrics26
@@ -0,0 +1,203 @@
+## -*- coding: UTF-8 -*-
+## columnar.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from construct.lib import Container
+
+'''
+Optional NumPy engine that maps the fixed-size record arrays in prefetch
+files (Section A and Section B) onto structured dtypes.  Each dtype mirrors
+the construct definition of the same name in src.structures.prefetch, with
+padding expressed through explicit field offsets and itemsize, so arrays are
+zero-copy views over the parse buffer and no per-entry Python objects are
+created.  All names below are None if NumPy is not installed.
+'''
+
+if np is not None:
+    '''
+    @src.structures.general.NTFSFileReference
+    '''
+    NTFSFileReference = np.dtype({\
+        'names':    ['SegmentNumber', 'SequenceNumber'],
+        'formats':  ['<u4', '<u2'],
+        'offsets':  [0, 6],
+        'itemsize': 8\
+    })
+
+    '''
+    @src.structures.prefetch.PrefetchTraceChainEntry
+    '''
+    PrefetchTraceChainEntry = np.dtype({\
+        'names':    ['NextEntryIndex', 'TotalBlockLoadCount', 'SampleDuration'],
+        'formats':  ['<u4', '<u4', 'u1'],
+        'offsets':  [0, 4, 9],
+        'itemsize': 12\
+    })
+
+    '''
+    @src.structures.prefetch.PrefetchFileMetricsEntry17
+    '''
+    PrefetchFileMetricsEntry17 = np.dtype({\
+        'names':    ['StartTime', 'Duration', 'FileNameOffset', 'FileNameLength'],
+        'formats':  ['<u4', '<u4', '<u4', '<u4'],
+        'offsets':  [0, 4, 8, 12],
+        'itemsize': 20\
+    })
+
+    '''
+    @src.structures.prefetch.PrefetchFileMetricsEntry23
+    '''
+    PrefetchFileMetricsEntry23 = np.dtype({\
+        'names':    ['StartTime', 'Duration', 'AverageDuration', 'FileNameOffset', 'FileNameLength', 'FileReference'],
+        'formats':  ['<u4', '<u4', '<u4', '<u4', '<u4', NTFSFileReference],
+        'offsets':  [0, 4, 8, 12, 16, 24],
+        'itemsize': 32\
+    })
+else:
+    NTFSFileReference = None
+    PrefetchTraceChainEntry = None
+    PrefetchFileMetricsEntry17 = None
+    PrefetchFileMetricsEntry23 = None
+
+PrefetchFileMetricsEntry26 = PrefetchFileMetricsEntry23
+
+PrefetchFileMetricsEntry30 = PrefetchFileMetricsEntry26
+
+def _decode(buffer, offset, count, dtype):
+    '''
+    Args:
+        buffer: memoryview  => buffer containing section
+        offset: Integer     => offset of section in buffer
+        count: Integer      => number of entries in section
+        dtype: numpy.dtype  => layout of each entry in section
+    Returns:
+        numpy.ndarray
+        Read-only structured array viewing count entries of buffer at offset
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+        dtype is of type numpy.dtype    (assumed True)
+    '''
+    assert np is not None, 'NumPy is required for columnar decoding'
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+def decode_trace_chains(buffer, offset, count):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of trace chains array (Section B) in buffer
+        count: Integer      => number of trace chain entries
+    Returns:
+        numpy.ndarray
+        Trace chains array as structured array (see: PrefetchTraceChainEntry)
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+    '''
+    return _decode(buffer, offset, count, PrefetchTraceChainEntry)
+
+def decode_file_metrics17(buffer, offset, count):
+    '''
+    Args:
+        buffer: memoryview  => buffer to read from
+        offset: Integer     => offset of file metrics array (Section A) in buffer
+        count: Integer      => number of file metrics entries
+    Returns:
+        numpy.ndarray
+        File metrics array as structured array (see: PrefetchFileMetricsEntry17)
+    Preconditions:
+        buffer is of type memoryview    (assumed True)
+        offset is of type Integer       (assumed True)
+        count is of type Integer        (assumed True)
+    '''
+    return _decode(buffer, offset, count, PrefetchFileMetricsEntry17)
+
+def decode_file_metrics23(buffer, offset, count):
+    '''
+    @decode_file_metrics17
+    '''
+    return _decode(buffer, offset, count, PrefetchFileMetricsEntry23)
+
+decode_file_metrics26 = decode_file_metrics23
+
+decode_file_metrics30 = decode_file_metrics26
+
+def _to_container(dtype, row):
+    '''
+    Args:
+        dtype: numpy.dtype  => structured dtype of row
+        row: Tuple<Any>     => row of structured array converted to Python values
+    Returns:
+        Container<String, Any>
+        Row with field names of dtype as keys
+    Preconditions:
+        dtype is of type numpy.dtype    (assumed True)
+        row is of type Tuple<Any>       (assumed True)
+    '''
+    return Container(\
+        (name, _to_container(dtype.fields[name][0], value) if dtype.fields[name][0].names is not None else value) \
+        for name, value in zip(dtype.names, row)\
+    )
+
+def to_containers(array):
+    '''
+    Args:
+        array: numpy.ndarray    => structured array to convert
+    Returns:
+        List<Container<String, Any>>
+        Rows of array as Containers (i.e. for JSON serialization)
+    Preconditions:
+        array is structured numpy.ndarray   (assumed True)
+    '''
+    return [_to_container(array.dtype, row) for row in array.tolist()]
+
+def to_columns(array, names):
+    '''
+    Args:
+        array: numpy.ndarray    => structured array to read columns from
+        names: Iterable<String> => names of columns to read, with nested fields 
+                                   named by their path (i.e. FileReference.SegmentNumber)
+    Returns:
+        List<List<Any>>
+        Each named column of array as a list of Python values, converted a column
+        at a time rather than a row at a time (i.e. for CSV export), or a list of 
+        None for names that are not fields of array
+    Preconditions:
+        array is structured numpy.ndarray       (assumed True)
+        names is of type Iterable<String>       (assumed True)
+    '''
+    columns = list()
+    for name in names:
+        column = array
+        for field in name.split('.'):
+            if column.dtype.names is None or field not in column.dtype.names:
+                column = None
+                break
+            column = column[field]
+        columns.append([None] * len(array) if column is None else column.tolist())
+    return columns
@@ -0,0 +1,240 @@
+## -*- coding: UTF-8 -*-
+## records.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from construct.lib import Container
+
+from src.utils.time import epoch_us_to_datetimes, epoch_us_to_datetime
+
+class BaseRecord(object):
+    '''
+    Base class for compact, fixed-field parse results.  Records store
+    their fields in __slots__ rather than a per-instance dictionary, but
+    support the same attribute and (read-only) mapping access as the 
+    construct Container objects they stand in for, so existing callers
+    (i.e. BaseTableTemplate.populate_fields) can consume them unchanged.
+    Mapping access covers the record's _FIELDS, which default to its
+    __slots__ but may instead name properties derived from them.
+    '''
+    __slots__ = ()
+    _FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super(BaseRecord, cls).__init_subclass__(**kwargs)
+        if '_FIELDS' not in cls.__dict__:
+            cls._FIELDS = cls.__slots__
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+    def __contains__(self, key):
+        return key in self._FIELDS
+    def __iter__(self):
+        return iter(self._FIELDS)
+    def __len__(self):
+        return len(self._FIELDS)
+    def __eq__(self, other):
+        if isinstance(other, BaseRecord):
+            return type(self) is type(other) and \
+                all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+        elif isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+    def __repr__(self):
+        return '%s(%s)'%(type(self).__name__, ', '.join('%s=%r'%(key, value) for key, value in self.items()))
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, field) for field in self.__slots__))
+    def keys(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Iterator<String>
+            Field names of this record, in structure order
+        Preconditions:
+            N/A
+        '''
+        return iter(self._FIELDS)
+    def values(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Iterator<Any>
+            Field values of this record, in structure order
+        Preconditions:
+            N/A
+        '''
+        return (getattr(self, field) for field in self._FIELDS)
+    def items(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Iterator<Tuple<String, Any>>
+            Field name and value pairs of this record, in structure order
+        Preconditions:
+            N/A
+        '''
+        return ((field, getattr(self, field)) for field in self._FIELDS)
+    def get(self, key, default=None):
+        '''
+        Args:
+            key: String     => field name to retrieve
+            default: Any    => value to return if field does not exist
+        Returns:
+            Any
+            Value of field key if exists, default otherwise
+        Preconditions:
+            key is of type String   (assumed True)
+        '''
+        return getattr(self, key, default) if key in self._FIELDS else default
+    def to_container(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Container<String, Any>
+            Copy of this record as a construct Container, with nested
+            records (and lists of records) converted as well
+        Preconditions:
+            N/A
+        '''
+        container = Container()
+        for key, value in self.items():
+            if isinstance(value, BaseRecord):
+                value = value.to_container()
+            elif isinstance(value, list):
+                value = [entry.to_container() if isinstance(entry, BaseRecord) else entry for entry in value]
+            container[key] = value
+        return container
+
+class Header(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchHeader
+    '''
+    __slots__ = ('Version', 'Signature', 'FileSize', 'ExecutableName', 'PrefetchHash')
+
+class FileInformation(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchFileInformation17
+    '''
+    __slots__ = (\
+        'SectionAOffset',
+        'SectionAEntriesCount',
+        'SectionBOffset',
+        'SectionBEntriesCount',
+        'SectionCOffset',
+        'SectionCLength',
+        'SectionDOffset',
+        'SectionDEntriesCount',
+        'SectionDLength',
+        'LastExecutionTimestamp',
+        'ExecutionCount'\
+    )
+    _FIELDS = __slots__[:9] + ('LastExecutionTime', 'ExecutionCount')
+
+    @property
+    def LastExecutionTime(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            List<DateTime<UTC>>
+            Last execution times, converted from LastExecutionTimestamp 
+            (microseconds since the Unix epoch) on access
+        Preconditions:
+            N/A
+        '''
+        return epoch_us_to_datetimes(self.LastExecutionTimestamp)
+
+class VolumeInformation(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchVolumeInformation17
+    '''
+    __slots__ = (\
+        'VolumeDevicePathOffset',
+        'VolumeDevicePathLength',
+        'VolumeCreateTimestamp',
+        'VolumeSerialNumber',
+        'SectionEOffset',
+        'SectionELength',
+        'SectionFOffset',
+        'SectionFStringsCount',
+        'VolumeDevicePath'\
+    )
+    _FIELDS = __slots__[:2] + ('VolumeCreateTime',) + __slots__[3:]
+
+    @property
+    def VolumeCreateTime(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            DateTime<UTC>
+            Volume creation time, converted from VolumeCreateTimestamp 
+            (microseconds since the Unix epoch) on access
+        Preconditions:
+            N/A
+        '''
+        return epoch_us_to_datetime(self.VolumeCreateTimestamp)
+
+class FileReferences(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchFileReferences
+    '''
+    __slots__ = ('ReferenceCount', 'References')
+
+class FileReference(BaseRecord):
+    '''
+    @src.structures.general.NTFSFileReference
+    '''
+    __slots__ = ('SegmentNumber', 'SequenceNumber')
+
+class TraceChainEntry(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchTraceChainEntry
+    '''
+    __slots__ = ('NextEntryIndex', 'TotalBlockLoadCount', 'SampleDuration')
+
+class FileMetricsEntry17(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchFileMetricsEntry17
+    '''
+    __slots__ = ('StartTime', 'Duration', 'FileNameOffset', 'FileNameLength')
+
+class FileMetricsEntry23(BaseRecord):
+    '''
+    @src.structures.prefetch.PrefetchFileMetricsEntry23
+    '''
+    __slots__ = ('StartTime', 'Duration', 'AverageDuration', 'FileNameOffset', 'FileNameLength', 'FileReference')
+
+FileMetricsEntry26 = FileMetricsEntry23
+
+FileMetricsEntry30 = FileMetricsEntry26
@@ -0,0 +1,186 @@
+## -*- coding: UTF-8 -*-
+## archive.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import logging
+Logger = logging.getLogger(__name__)
+from os import path, getpid
+from datetime import datetime
+from collections import OrderedDict
+import zipfile
+import tarfile
+from dateutil.tz import tzlocal, tzutc
+
+'''
+Archives opened by this process, most recently used last (see: _open_archive).
+Handles inherited from a parent process share its file offsets, so the cache
+is discarded (without closing the handles) when first used in a new process
+'''
+_OPEN_ARCHIVES = OrderedDict()
+_OPEN_ARCHIVES_PID = None
+_MAX_OPEN_ARCHIVES = 4
+
+def is_archive(filepath):
+    '''
+    Args:
+        filepath: String    => path to file to check
+    Returns:
+        Boolean
+        True if filepath is a zip or tar archive, False otherwise
+    Preconditions:
+        filepath is of type String  (assumed True)
+    '''
+    try:
+        return zipfile.is_zipfile(filepath) or tarfile.is_tarfile(filepath)
+    except Exception:
+        return False
+
+def _open_archive_file(archive_path):
+    '''
+    Args:
+        archive_path: String    => path to zip or tar archive
+    Returns:
+        ZipFile|TarFile
+        New handle to archive_path
+    Preconditions:
+        archive_path is of type String  (assumed True)
+    '''
+    if zipfile.is_zipfile(archive_path):
+        return zipfile.ZipFile(archive_path, 'r')
+    return tarfile.open(archive_path, 'r:*')
+
+def _open_archive(archive_path):
+    '''
+    Args:
+        archive_path: String    => path to zip or tar archive
+    Returns:
+        ZipFile|TarFile
+        Open handle to archive_path, reused across calls in this process
+        so that reading many members of the same archive doesn't re-read its index
+    Preconditions:
+        archive_path is of type String  (assumed True)
+    '''
+    global _OPEN_ARCHIVES, _OPEN_ARCHIVES_PID
+    if _OPEN_ARCHIVES_PID != getpid():
+        _OPEN_ARCHIVES = OrderedDict()
+        _OPEN_ARCHIVES_PID = getpid()
+    archive = _OPEN_ARCHIVES.pop(archive_path, None)
+    if archive is None:
+        archive = _open_archive_file(archive_path)
+        while len(_OPEN_ARCHIVES) >= _MAX_OPEN_ARCHIVES:
+            _OPEN_ARCHIVES.popitem(last=False)[1].close()
+    _OPEN_ARCHIVES[archive_path] = archive
+    return archive
+
+def get_archive_members(archive_path, extension='.pf'):
+    '''
+    Args:
+        archive_path: String    => path to zip or tar archive
+        extension: String       => (case-insensitive) extension of members to return
+    Returns:
+        List<ArchiveMember>
+        Regular file members of archive_path whose names end with extension
+    Preconditions:
+        archive_path is of type String  (assumed True)
+        extension is of type String     (assumed True)
+    '''
+    members = list()
+    with _open_archive_file(archive_path) as archive:
+        if isinstance(archive, zipfile.ZipFile):
+            for info in archive.infolist():
+                if not info.filename.endswith('/') and info.filename.lower().endswith(extension.lower()):
+                    members.append(ArchiveMember(\
+                        archive_path, 
+                        info.filename, 
+                        info.file_size, 
+                        datetime(*info.date_time, tzinfo=tzlocal()).astimezone(tzutc())\
+                    ))
+        else:
+            for info in archive.getmembers():
+                if info.isfile() and info.name.lower().endswith(extension.lower()):
+                    info.tarfile = None
+                    members.append(ArchiveMember(\
+                        archive_path, 
+                        info.name, 
+                        info.size, 
+                        datetime.fromtimestamp(info.mtime, tzlocal()).astimezone(tzutc()),
+                        info\
+                    ))
+    return members
+
+class ArchiveMember(object):
+    '''
+    Reference to a member file of a zip or tar archive, which can be read
+    without extracting the archive to disk.  Members of tar archives keep the
+    TarInfo read from the archive's index, so they can be read directly from
+    their offset in the archive rather than looked up by name
+    '''
+    def __init__(self, archive_path, member_name, size=None, modify_time=None, tarinfo=None):
+        self.archive_path = archive_path
+        self.member_name = member_name
+        self.size = size
+        self.modify_time = modify_time
+        self.tarinfo = tarinfo
+    def __str__(self):
+        return path.join(self.archive_path, *self.member_name.split('/'))
+    def __repr__(self):
+        return 'ArchiveMember(%r, %r)'%(self.archive_path, self.member_name)
+    @property
+    def archive_offset(self):
+        '''
+        @archive_offset.getter
+        Offset of this member's data in its (uncompressed) tar archive, 
+        or None if this is not a tar archive member
+        '''
+        return None if self.tarinfo is None else self.tarinfo.offset_data
+    def read(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            ByteString
+            Contents of archive member
+            **NOTE: compressed tar archives can only be read sequentially, so reading
+                    their members out of archive order (see: ArchiveMember.archive_offset)
+                    decompresses the archive from the start again for each member
+        Preconditions:
+            N/A
+        '''
+        archive = _open_archive(self.archive_path)
+        if isinstance(archive, zipfile.ZipFile):
+            return archive.read(self.member_name)
+        member = archive.extractfile(self.tarinfo if self.tarinfo is not None else self.member_name)
+        if member is None:
+            raise IOError('Archive member %s is not a regular file'%self.member_name)
+        return member.read()
+    def get_metadata(self):
+        '''
+        Args:
+            N/A
+        Returns:
+            Dict<String, Any>
+            Filesystem metadata recorded for this member in the archive
+            (see: src.parsers.prefetch.Prefetch.from_bytes)
+        Preconditions:
+            N/A
+        '''
+        return dict(modify_time=self.modify_time)
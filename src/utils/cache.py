@@ -0,0 +1,316 @@
+## -*- coding: UTF-8 -*-
+## cache.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import logging
+Logger = logging.getLogger(__name__)
+from os import path, stat, getpid, makedirs, replace, remove, utime, walk
+from time import time
+import sqlite3
+
+'''
+Metadata caches opened by this process, by cache path (see: get_metadata_cache).
+Connections inherited from a parent process must not be reused, so the
+registry is discarded when first used in a new process
+'''
+_OPEN_CACHES = dict()
+_OPEN_CACHES_PID = None
+
+class MetadataCache(object):
+    '''
+    Persistent cache of prefetch file digests (see: src.parsers.prefetch.Prefetch.get_metadata),
+    stored in a SQLite database and keyed on file identity (path, size, 
+    modification time in nanoseconds and inode), so repeated runs over the same
+    files skip rehashing any file that has not changed since it was last hashed
+    '''
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS file_metadata (
+            file_path   TEXT    NOT NULL PRIMARY KEY,
+            file_size   INTEGER NOT NULL,
+            mtime_ns    INTEGER NOT NULL,
+            inode       INTEGER NOT NULL,
+            md5hash     TEXT,
+            sha1hash    TEXT,
+            sha2hash    TEXT,
+            last_used   REAL    NOT NULL
+        )
+    '''
+    _TIMEOUT = 60
+
+    def __init__(self, cache_path):
+        self._cache_path = path.abspath(cache_path)
+        self._connection = None
+    @property
+    def cache_path(self):
+        '''
+        @cache_path.getter
+        '''
+        return self._cache_path
+    @property
+    def connection(self):
+        '''
+        @connection.getter
+        '''
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._cache_path, timeout=self._TIMEOUT, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(self._SCHEMA)
+        return self._connection
+    @staticmethod
+    def _get_identity(filepath, stat_result=None):
+        '''
+        Args:
+            filepath: String            => path to file
+            stat_result: os.stat_result => result of stat call on filepath, if already made
+        Returns:
+            Tuple<String, Integer, Integer, Integer>
+            Identity of filepath: absolute path, size, modification time in nanoseconds and inode
+        Preconditions:
+            filepath is of type String  (assumed True)
+        '''
+        if stat_result is None:
+            stat_result = stat(filepath)
+        return (path.abspath(filepath), stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+    def get(self, filepath, stat_result=None):
+        '''
+        Args:
+            @MetadataCache._get_identity
+        Returns:
+            Tuple<String, String, String>
+            MD5, SHA1 and SHA256 digests cached for filepath (MD5 and SHA1 may be None),
+            or None if filepath is not cached or has changed since it was cached
+        Preconditions:
+            @MetadataCache._get_identity
+        '''
+        identity = self._get_identity(filepath, stat_result)
+        row = self.connection.execute(\
+            'SELECT md5hash, sha1hash, sha2hash FROM file_metadata WHERE file_path = ? AND file_size = ? AND mtime_ns = ? AND inode = ?', 
+            identity\
+        ).fetchone()
+        if row is not None:
+            self.connection.execute('UPDATE file_metadata SET last_used = ? WHERE file_path = ?', (time(), identity[0]))
+        return row
+    def put(self, filepath, md5hash, sha1hash, sha2hash, stat_result=None):
+        '''
+        Args:
+            md5hash: String     => MD5 digest of filepath (may be None)
+            sha1hash: String    => SHA1 digest of filepath (may be None)
+            sha2hash: String    => SHA256 digest of filepath
+            @MetadataCache._get_identity
+        Procedure:
+            Cache digests of filepath, replacing any entry for the same path
+        Preconditions:
+            md5hash is of type String   (assumed True)
+            sha1hash is of type String  (assumed True)
+            sha2hash is of type String  (assumed True)
+            @MetadataCache._get_identity
+        '''
+        self.connection.execute(\
+            'INSERT OR REPLACE INTO file_metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)', 
+            self._get_identity(filepath, stat_result) + (md5hash, sha1hash, sha2hash, time())\
+        )
+    def invalidate(self, paths=None):
+        '''
+        Args:
+            paths: Iterable<String> => paths of files (or directories containing files) 
+                                       to remove from the cache (default: all)
+        Returns:
+            Integer
+            Number of entries removed from the cache
+        Preconditions:
+            paths is of type Iterable<String>   (assumed True)
+        '''
+        if paths is None:
+            return self.connection.execute('DELETE FROM file_metadata').rowcount
+        removed = 0
+        for filepath in paths:
+            filepath = path.abspath(filepath)
+            prefix = filepath.rstrip(path.sep) + path.sep
+            removed += self.connection.execute(\
+                'DELETE FROM file_metadata WHERE file_path = ? OR substr(file_path, 1, ?) = ?', 
+                (filepath, len(prefix), prefix)\
+            ).rowcount
+        return removed
+    def evict(self, max_entries=None, max_age=None):
+        '''
+        Args:
+            max_entries: Integer    => maximum number of entries to keep, least recently used are removed first
+            max_age: Integer        => maximum number of days since an entry was last used
+        Returns:
+            Integer
+            Number of entries removed from the cache
+        Preconditions:
+            max_entries is of type Integer >= 0 (assumed True)
+            max_age is of type Integer >= 0     (assumed True)
+        '''
+        removed = 0
+        if max_age is not None:
+            removed += self.connection.execute(\
+                'DELETE FROM file_metadata WHERE last_used < ?', 
+                (time() - max_age * 86400,)\
+            ).rowcount
+        if max_entries is not None:
+            removed += self.connection.execute(\
+                'DELETE FROM file_metadata WHERE file_path NOT IN (SELECT file_path FROM file_metadata ORDER BY last_used DESC LIMIT ?)', 
+                (max_entries,)\
+            ).rowcount
+        return removed
+    def close(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Close connection to cache database, if open
+        Preconditions:
+            N/A
+        '''
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM file_metadata').fetchone()[0]
+    def __repr__(self):
+        return 'MetadataCache(%r)'%self._cache_path
+
+def get_metadata_cache(cache_path):
+    '''
+    Args:
+        cache_path: String  => path to cache database
+    Returns:
+        MetadataCache
+        Cache at cache_path, shared by all callers in this process, or None if cache_path is None
+    Preconditions:
+        cache_path is of type String    (assumed True)
+    '''
+    global _OPEN_CACHES, _OPEN_CACHES_PID
+    if cache_path is None:
+        return None
+    if _OPEN_CACHES_PID != getpid():
+        _OPEN_CACHES = dict()
+        _OPEN_CACHES_PID = getpid()
+    cache = _OPEN_CACHES.get(cache_path)
+    if cache is None:
+        cache = _OPEN_CACHES[cache_path] = MetadataCache(cache_path)
+    return cache
+
+class PayloadCache(object):
+    '''
+    Content-addressed cache of decompressed Win10 prefetch payloads, stored as
+    files named by the SHA256 digest of the compressed file they were decompressed
+    from, so re-parsing the same MAM-compressed files reads the payload instead of 
+    decompressing again.  The modification time of each entry is updated when it is 
+    read, and the least recently used entries are evicted first (see: PayloadCache.evict)
+    '''
+    _EXTENSION = '.pf'
+
+    def __init__(self, cache_dir):
+        self._cache_dir = path.abspath(cache_dir)
+    @property
+    def cache_dir(self):
+        '''
+        @cache_dir.getter
+        '''
+        return self._cache_dir
+    def _get_path(self, digest):
+        '''
+        Args:
+            digest: String  => SHA256 hex digest of compressed file
+        Returns:
+            String
+            Path to cache entry for digest
+        Preconditions:
+            digest is of type String    (assumed True)
+        '''
+        return path.join(self._cache_dir, digest[:2], digest + self._EXTENSION)
+    def get(self, digest):
+        '''
+        Args:
+            @PayloadCache._get_path
+        Returns:
+            ByteArray
+            Decompressed payload cached for digest, or None if not cached
+        Preconditions:
+            @PayloadCache._get_path
+        '''
+        entry_path = self._get_path(digest)
+        try:
+            with open(entry_path, 'rb') as entry:
+                payload = bytearray(entry.read())
+            utime(entry_path)
+        except (IOError, OSError):
+            return None
+        return payload
+    def put(self, digest, payload):
+        '''
+        Args:
+            payload: ByteString => decompressed payload to cache
+            @PayloadCache._get_path
+        Procedure:
+            Write payload to cache entry for digest, via a temporary file so that
+            concurrent readers (i.e. other workers) never see a partial entry
+        Preconditions:
+            payload is of type ByteString   (assumed True)
+            @PayloadCache._get_path
+        '''
+        entry_path = self._get_path(digest)
+        makedirs(path.dirname(entry_path), exist_ok=True)
+        temp_path = '%s.%d.tmp'%(entry_path, getpid())
+        with open(temp_path, 'wb') as entry:
+            entry.write(payload)
+        replace(temp_path, entry_path)
+    def evict(self, max_size):
+        '''
+        Args:
+            max_size: Integer   => maximum total size of cache entries in bytes
+        Returns:
+            Integer
+            Number of entries removed, least recently used first, to bring
+            the cache under max_size
+        Preconditions:
+            max_size is of type Integer >= 0    (assumed True)
+        '''
+        entries = list()
+        total_size = 0
+        for dirpath, _, filenames in walk(self._cache_dir):
+            for filename in filenames:
+                if filename.endswith(self._EXTENSION):
+                    entry_path = path.join(dirpath, filename)
+                    try:
+                        stat_result = stat(entry_path)
+                    except OSError:
+                        continue
+                    entries.append((stat_result.st_mtime_ns, stat_result.st_size, entry_path))
+                    total_size += stat_result.st_size
+        removed = 0
+        for _, size, entry_path in sorted(entries):
+            if total_size <= max_size:
+                break
+            try:
+                remove(entry_path)
+            except OSError as e:
+                Logger.warning('Failed to evict payload cache entry %s (%s)'%(entry_path, str(e)))
+            else:
+                total_size -= size
+                removed += 1
+        return removed
+    def __repr__(self):
+        return 'PayloadCache(%r)'%self._cache_dir
@@ -71,6 +71,66 @@ def coalesce_files(glob_pattern, target, transform=lambda line: line, clean=True
                 for path in file_list:
                     os.remove(path)
 
+def get_index_path(filepath):
+    '''
+    Args:
+        filepath: String    => path of file to get index file path for
+    Returns:
+        String
+        Path of the file that records the keyed blocks written to filepath
+        (see: coalesce_indexed_files)
+    Preconditions:
+        filepath is of type String
+    '''
+    assert isinstance(filepath, str), 'Filepath is not of type String'
+    return os.path.splitext(filepath)[0] + '.idx'
+
+def coalesce_indexed_files(glob_pattern, target, clean=True):
+    '''
+    Args:
+        glob_pattern: String    => glob pattern of files to merge
+        target: String          => file path to merge files into
+    Procedure:
+        Gather all files that match glob_pattern and copy the blocks they contain into target
+        in order of key, where each file has an index file (see: get_index_path) with one
+        line of the form '<key> <offset> <length>' per block written to it.  Blocks with the same
+        key are copied in the order they were written, so target does not depend on which file
+        each block was written to or in what order the files were written
+        **NOTE: blocks not recorded in an index file are dropped
+    Preconditions:
+        glob_pattern is of type String
+        target is of type String
+    '''
+    assert isinstance(glob_pattern, str), 'Glob_pattern is not of type String'
+    assert isinstance(target, str), 'Target is not of type String'
+    file_list = glob(glob_pattern)
+    if len(file_list) == 0:
+        return
+    blocks = list()
+    for fileidx, filepath in enumerate(file_list):
+        index_path = get_index_path(filepath)
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as index_file:
+                for line in index_file:
+                    key, offset, length = line.split()
+                    blocks.append((int(key), fileidx, int(offset), int(length)))
+    blocks.sort()
+    handle_list = [open(filepath, 'rb') for filepath in file_list]
+    try:
+        with open(target, 'ab') as target_file:
+            for key, fileidx, offset, length in blocks:
+                handle = handle_list[fileidx]
+                handle.seek(offset)
+                target_file.write(handle.read(length))
+    finally:
+        for handle in handle_list:
+            handle.close()
+        if clean:
+            for path in file_list:
+                os.remove(path)
+                if os.path.exists(get_index_path(path)):
+                    os.remove(get_index_path(path))
+
 class BaseQueueWorker(Process):
     '''
     Class to spawn worker process with queue of tasks
@@ -238,19 +298,86 @@ class DBProgressTrackerWorker(ProgressTrackerWorker):
         self.manager.close_session()
         self.manager.engine.dispose()
 
+class TaskBatch(object):
+    '''
+    Batch of tasks put on a task queue as a single item, so that the cost of pickling
+    and of the queue handshake (put, get and task_done) is paid once per batch rather 
+    than once per task.  Tasks are either added already created or as the arguments 
+    to create them with in the worker, in which case the keyword arguments shared by 
+    every task of the batch are only pickled once
+    '''
+    def __init__(self, task_class=None, task_kwargs=dict()):
+        self._task_class = task_class
+        self._task_kwargs = task_kwargs
+        self._entries = list()
+    def __len__(self):
+        return len(self._entries)
+    def add_task(self, task):
+        '''
+        Args:
+            task: Any   => already-created task
+        Procedure:
+            Add task to batch
+        Preconditions:
+            N/A
+        '''
+        self._entries.append((task, None, None))
+    def add_task_args(self, args, kwargs):
+        '''
+        Args:
+            args: Tuple<Any>            => positional arguments to create task with
+            kwargs: Dict<String, Any>   => keyword arguments to create task with
+        Procedure:
+            Add task to be created from self._task_class with args, kwargs 
+            and self._task_kwargs (see: WorkerPool.create_task) to batch
+        Preconditions:
+            args is of type Tuple<Any>          (assumed True)
+            kwargs is of type Dict<String, Any> (assumed True)
+        '''
+        self._entries.append((None, args, kwargs))
+    def __call__(self, worker):
+        '''
+        Args:
+            worker: BaseQueueWorker => worker that called this batch
+        Returns:
+            List<Any>
+            Results of running each task in batch, with the exception
+            raised by a task in place of its results if it failed
+            (see: LoggedQueueWorker._process_task)
+        Preconditions:
+            worker is subclass of BaseQueueWorker
+        '''
+        results = list()
+        for task, args, kwargs in self._entries:
+            try:
+                if task is None:
+                    task_args = dict(kwargs)
+                    task_args.update(self._task_kwargs)
+                    task = self._task_class(*args, **task_args)
+                results.extend(task(worker) if callable(task) else task)
+            except Exception as e:
+                Logger.error('Uncaught exception while executing %s (%s)'%(\
+                    type(task).__name__ if task is not None else self._task_class.__name__, 
+                    str(e)\
+                ))
+                results.append(e)
+        return results
+
 class WorkerPool(object):
     '''
     Class to manage pool of process workers
     '''
-    def __init__(self, task_queue, task_class, daemonize=True, worker_class=LoggedQueueWorker, worker_count=(2 if cpu_count() <= 4 else 4), worker_kwargs=dict(), task_kwargs=dict()):
+    def __init__(self, task_queue, task_class, daemonize=True, worker_class=LoggedQueueWorker, worker_count=(2 if cpu_count() <= 4 else 4), worker_kwargs=dict(), task_kwargs=dict(), batch_size=1):
         self._queue = task_queue
         self._task_class = task_class
         self._worker_class = worker_class
         self._task_kwargs = task_kwargs
         self._worker_kwargs = worker_kwargs
         self._workers = None
+        self._batch = None
         self.daemon = daemonize
         self.worker_count = worker_count
+        self.batch_size = batch_size
     def __repr__(self):
         return 'WorkerPool(%s,%s worker_class=%s, daemonize=%s, worker_count=%s%s)'%(\
             type(self._queue).__name__ + '()',\
@@ -329,19 +456,56 @@ class WorkerPool(object):
                 if poison_pill is True, None is added
                 if include is True, assumes first arg is already-created Task
                 else, self._task_class is used to create Task
+                if self.batch_size is greater than 1, tasks are collected into a TaskBatch
+                that is added once it holds self.batch_size tasks (see: WorkerPool.flush_tasks)
         Preconditions:
             N/A
         '''
         action = 'put'
         if poison_pill:
+            self.flush_tasks()
             task = None
+        elif self.batch_size > 1:
+            if self._batch is None:
+                self._batch = TaskBatch(self._task_class, self._task_kwargs)
+            if included:
+                self._batch.add_task(args[0])
+            else:
+                self._batch.add_task_args(args, kwargs)
+            if len(self._batch) >= self.batch_size:
+                self.flush_tasks()
+            return
         elif included:
             task = args[0]
         else:
-            task_args = dict(kwargs)
-            task_args.update(self._task_kwargs)
-            task = self._task_class(*args, **task_args)
+            task = self.create_task(*args, **kwargs)
         getattr(self._queue, action)(task)
+    def flush_tasks(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Add partially filled batch of tasks (if any) to task queue
+        Preconditions:
+            N/A
+        '''
+        if self._batch is not None and len(self._batch) > 0:
+            self._queue.put(self._batch)
+        self._batch = None
+    def create_task(self, *args, **kwargs):
+        '''
+        Args:
+            N/A
+        Returns:
+            Any
+            Task created from self._task_class with args, kwargs and self._task_kwargs,
+            without adding it to the task queue (see: WorkerPool.add_task)
+        Preconditions:
+            N/A
+        '''
+        task_args = dict(kwargs)
+        task_args.update(self._task_kwargs)
+        return self._task_class(*args, **task_args)
     def add_poison_pills(self):
         '''
         Args:
@@ -386,10 +550,12 @@ class WorkerPool(object):
         Args:
             N/A
         Procedure:
-            Join on self._queue if is of type JoinableQueue
+            Add any partially filled batch of tasks, then 
+            join on self._queue if is of type JoinableQueue
         Preconditions:
             N/A
         '''
+        self.flush_tasks()
         if hasattr(self._queue, 'join') and callable(self._queue.join):
             self._queue.join()
     def join_workers(self):
@@ -0,0 +1,88 @@
+## -*- coding: UTF-8 -*-
+## strings.py
+##
+## Copyright (c) 2018 Noah Rubin
+## 
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+## 
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+## 
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+class StringTable(object):
+    '''
+    Table of interned strings.  Each distinct string added to the table is
+    stored once, so that parse results holding the same string (i.e. a DLL
+    path that appears in almost every prefetch file) share a single object.
+    The table holds at most max_size strings (default: _MAX_SIZE), after which
+    strings not already in it are returned as-is
+    '''
+    _MAX_SIZE = 65536
+
+    def __init__(self, max_size=None):
+        self._strings = dict()
+        self.max_size = self._MAX_SIZE if max_size is None else max_size
+    def __len__(self):
+        return len(self._strings)
+    def __contains__(self, value):
+        return value in self._strings
+    def __repr__(self):
+        return 'StringTable(size=%d, max_size=%d)'%(len(self), self.max_size)
+    def intern(self, value):
+        '''
+        Args:
+            value: String   => string to intern
+        Returns:
+            String
+            Interned copy of value if value is (or could be added to) the table, 
+            value otherwise.  None is returned as-is
+        Preconditions:
+            value is of type String or None (assumed True)
+        '''
+        if value is None:
+            return None
+        interned = self._strings.get(value)
+        if interned is None:
+            if len(self._strings) >= self.max_size:
+                return value
+            self._strings[value] = interned = value
+        return interned
+    def intern_all(self, values):
+        '''
+        Args:
+            values: Iterable<String>    => strings to intern
+        Returns:
+            List<String>
+            Interned copy of each string in values (see: StringTable.intern)
+        Preconditions:
+            values is of type Iterable<String>  (assumed True)
+        '''
+        return [self.intern(value) for value in values]
+    def clear(self):
+        '''
+        Args:
+            N/A
+        Procedure:
+            Remove all strings from the table
+        Preconditions:
+            N/A
+        '''
+        self._strings.clear()
+
+'''
+String table shared by all parsers in this process, so that each worker
+process stores each filename and directory string it parses once
+'''
+STRING_TABLE = StringTable()
@@ -21,7 +21,76 @@
 ## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 ## SOFTWARE.
 
-from datetime import datetime, timezone
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from datetime import datetime, timezone, timedelta
+
+'''
+Number of 100-nanosecond intervals between the FILETIME epoch
+(01/01/1601 00:00:00 UTC) and the Unix epoch (01/01/1970 00:00:00 UTC)
+'''
+FILETIME_EPOCH_OFFSET = 116444736000000000
+
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def filetime_to_epoch_us(filetime):
+    '''
+    Args:
+        filetime: Integer   => raw 64-bit FILETIME value
+    Returns:
+        Integer
+        filetime converted to microseconds since the Unix epoch
+        (truncating the remaining 100-nanosecond intervals)
+    Preconditions:
+        filetime is of type Integer (assumed True)
+    '''
+    return (filetime - FILETIME_EPOCH_OFFSET) // 10
+
+def filetimes_to_epoch_us(filetimes):
+    '''
+    Args:
+        filetimes: Iterable<Integer>|numpy.ndarray  => raw 64-bit FILETIME values
+    Returns:
+        List<Integer>|numpy.ndarray
+        filetimes converted to microseconds since the Unix epoch
+        (see: filetime_to_epoch_us).  If NumPy is installed and filetimes is
+        an array, the conversion is vectorized and an int64 array is returned
+    Preconditions:
+        filetimes is of type Iterable<Integer> or numpy.ndarray (assumed True)
+    '''
+    if np is not None and isinstance(filetimes, np.ndarray):
+        return (filetimes.astype(np.uint64) - np.uint64(FILETIME_EPOCH_OFFSET)).view(np.int64) // 10
+    return [(filetime - FILETIME_EPOCH_OFFSET) // 10 for filetime in filetimes]
+
+def epoch_us_to_datetime(epoch_us):
+    '''
+    Args:
+        epoch_us: Integer   => microseconds since the Unix epoch
+    Returns:
+        DateTime<UTC>
+        epoch_us converted to timezone-aware datetime if in range of
+        datetime, None otherwise
+    Preconditions:
+        epoch_us is of type Integer (assumed True)
+    '''
+    try:
+        return UNIX_EPOCH + timedelta(microseconds=int(epoch_us))
+    except OverflowError:
+        return None
+
+def epoch_us_to_datetimes(epoch_us):
+    '''
+    Args:
+        epoch_us: Iterable<Integer>|numpy.ndarray   => microseconds since the Unix epoch
+    Returns:
+        List<DateTime<UTC>>
+        epoch_us converted to timezone-aware datetimes (see: epoch_us_to_datetime)
+    Preconditions:
+        epoch_us is of type Iterable<Integer> or numpy.ndarray  (assumed True)
+    '''
+    return [epoch_us_to_datetime(value) for value in epoch_us]
 
 class WindowsTime(object):
     '''
@@ -62,10 +131,4 @@ class WindowsTime(object):
         Preconditions:
             N/A
         '''
-        try:
-            return datetime.fromtimestamp( \
-                ( float(self._high) * 2 ** 32 + self._low ) * 1e-7 - 11644473600, \
-                timezone.utc
-            )
-        except:
-            return None
+        return epoch_us_to_datetime(filetime_to_epoch_us((self._high << 32) | self._low))